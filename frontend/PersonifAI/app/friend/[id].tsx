@@ -94,7 +94,9 @@ export default function ChatScreen() {
       const response = await apiService.sendTextMessage(friend.id, text);
       console.log("✅ Backend response:", response);
 
-      if (response && response.results) {
+      // Messages merged into a later one's turn come back with no results;
+      // the reply arrives on the response to the last of them
+      if (response && response.results && response.results.length > 0) {
         // Combine all response chunks into one message
         const fullText = response.results
           .map((r: any) => r.clean_text)
@@ -112,15 +114,11 @@ export default function ChatScreen() {
         setMessages((prev) => [...prev, aiMessage]);
 
         // Play audio response if available
-        if (response.audio) {
+        if (response.audio_url) {
           console.log("🔊 Playing audio response...");
           try {
-            // Create data URI from base64 audio
-            const audioUri = `data:audio/mpeg;base64,${response.audio}`;
-            console.log("💾 Audio URI created");
-
-            // Play the audio file
-            playAudioResponse(audioUri);
+            // Audio is served separately as MP3; stream it straight from the URL
+            playAudioResponse(response.audio_url);
           } catch (audioError) {
             console.error("❌ Error handling audio:", audioError);
           }
@@ -156,8 +154,8 @@ export default function ChatScreen() {
         setMessages((prev) => [...prev, userMessage]);
         console.log("✅ Added transcribed message:", response.transcribed_text);
 
-        // Add AI response(s)
-        if (response.results && Array.isArray(response.results)) {
+        // Add AI response(s), unless this message was merged into a later one's turn
+        if (Array.isArray(response.results) && response.results.length > 0) {
           const fullText = response.results
             .map((r: any) => r.clean_text)
             .join(" ")
@@ -174,15 +172,11 @@ export default function ChatScreen() {
           setMessages((prev) => [...prev, aiMessage]);
 
           // Play audio response if available
-          if (response.audio) {
+          if (response.audio_url) {
             console.log("🔊 Playing audio response...");
             try {
-              // Create data URI from base64 audio
-              const audioUri = `data:audio/mpeg;base64,${response.audio}`;
-              console.log("💾 Audio URI created");
-
-              // Play the audio file
-              playAudioResponse(audioUri);
+              // Audio is served separately as MP3; stream it straight from the URL
+              playAudioResponse(response.audio_url);
             } catch (audioError) {
               console.error("❌ Error handling audio:", audioError);
             }
@@ -1,5 +1,6 @@
 import * as THREE from "three";
 import { GLTFLoader } from "three/examples/jsm/loaders/GLTFLoader.js";
+import { MeshoptDecoder } from "three/examples/jsm/libs/meshopt_decoder.module.js";
 
 let renderer, scene, camera, currentModel, mixer, clock;
 let animationId;
@@ -110,6 +111,7 @@ export function createScene() {
 
     loadModel(url) {
       const loader = new GLTFLoader();
+      loader.setMeshoptDecoder(MeshoptDecoder); // server LODs may be meshopt-compressed
       loader.load(url, (gltf) => {
         currentModel = gltf.scene;
         currentModel.scale.setScalar(1);
@@ -1,5 +1,6 @@
 import * as THREE from "three";
 import { GLTFLoader } from "three/examples/jsm/loaders/GLTFLoader";
+import { MeshoptDecoder } from "three/examples/jsm/libs/meshopt_decoder.module.js";
 
 export function createScene(gl, width, height) {
   /* ---------------- Scene ---------------- */
@@ -103,6 +104,7 @@ export function createScene(gl, width, height) {
   // Uses standard Three.js loader.load() as requested
   const loadModel = (url) => {
     const loader = new GLTFLoader();
+    loader.setMeshoptDecoder(MeshoptDecoder); // server LODs may be meshopt-compressed
 
     loader.load(
       url,
@@ -0,0 +1,88 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from app.metrics import QUEUE_WAIT_SECONDS, REJECTED_TOTAL
+
+
+class Overloaded(Exception):
+    """No slot could be had; `retry_after` is a hint in whole seconds"""
+
+    def __init__(self, endpoint: str, retry_after: int):
+        super().__init__(f"{endpoint} is at capacity")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Admission control for one expensive endpoint: at most `max_concurrency`
+    requests run at once and at most `max_queue` more wait for a slot, each
+    for no longer than `queue_timeout` seconds. Anything beyond that is
+    rejected immediately with Overloaded, so a burst can't pile up work (and
+    memory) without bound. Queue waits and rejections go to /metrics.
+    """
+
+    def __init__(self, endpoint: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.endpoint = endpoint
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long a request holds its slot, for Retry-After
+        self.avg_seconds = 1.0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a concurrency slot for the enclosed block, or raise Overloaded"""
+        start = time.perf_counter()
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()  # free slot: returns without yielding
+        elif self.waiting >= self.max_queue:
+            raise self._reject()
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject() from None
+            finally:
+                self.waiting -= 1
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start, endpoint=self.endpoint)
+
+        self.active += 1
+        self.admitted += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+            self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.perf_counter() - started)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained"""
+        return max(1, math.ceil(self.avg_seconds * (self.waiting + 1) / self.max_concurrency))
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_seconds": round(self.avg_seconds, 3),
+        }
+
+    def _reject(self) -> Overloaded:
+        self.rejected += 1
+        REJECTED_TOTAL.inc(endpoint=self.endpoint)
+        return Overloaded(self.endpoint, self.retry_after())
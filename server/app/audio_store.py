@@ -0,0 +1,77 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class AudioStore:
+    """
+    Short-lived in-memory store for generated reply audio, so responses can
+    hand out an /audio/{id} URL instead of inlining base64 MP3 in JSON.
+    Entries expire after `ttl` seconds; the oldest are dropped once the
+    store holds more than `max_bytes`.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[bytes, str, float]]" = OrderedDict()
+        self.total_bytes = 0
+
+    def put(self, data: bytes, media_type: str = "audio/mpeg") -> str:
+        """Store audio bytes and return their id"""
+        self._expire()
+        audio_id = uuid.uuid4().hex
+        self.entries[audio_id] = (data, media_type, time.monotonic() + self.ttl)
+        self.total_bytes += len(data)
+
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, (old, _, _) = self.entries.popitem(last=False)
+            self.total_bytes -= len(old)
+        return audio_id
+
+    def get(self, audio_id: str) -> Optional[Tuple[bytes, str]]:
+        """Return (bytes, media_type), or None if unknown or expired"""
+        self._expire()
+        entry = self.entries.get(audio_id)
+        if entry is None:
+            return None
+        data, media_type, _ = entry
+        return data, media_type
+
+    def _expire(self):
+        now = time.monotonic()
+        while self.entries:
+            audio_id, (data, _, expires_at) = next(iter(self.entries.items()))
+            if expires_at > now:
+                break
+            self.entries.popitem(last=False)
+            self.total_bytes -= len(data)
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header into an inclusive (start, end).
+    Returns None when there is no usable Range header; raises ValueError if
+    the range can't be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        # Multipart ranges aren't worth it for short clips; send the whole file
+        return None
+
+    start_s, _, end_s = spec.partition("-")
+    if start_s == "":
+        # Suffix range: last N bytes
+        length = int(end_s)
+        if length <= 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
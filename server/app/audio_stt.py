@@ -1,6 +1,98 @@
+import os
+import io
+import wave
+import asyncio
+import tempfile
 import threading
 import queue
-from faster_whisper import WhisperModel
+import time
+from concurrent.futures import Future
+import numpy as np
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+SAMPLE_RATE = 16000  # what WhisperModel.transcribe expects for raw arrays
+CHUNK_SAMPLES = 30 * SAMPLE_RATE  # Whisper's window; longer clips are split for batching
+FRAME_SAMPLES = SAMPLE_RATE // 100  # one Whisper frame (10 ms)
+
+
+def default_num_workers() -> int:
+    """Pool size for the shared STT workers (STT_WORKERS env var or half the CPU cores)"""
+    env = os.getenv("STT_WORKERS")
+    if env:
+        return max(1, int(env))
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+def resample(audio: np.ndarray, sampling_rate: int) -> np.ndarray:
+    """Linear-interpolation resample of a mono float32 buffer to 16 kHz"""
+    if sampling_rate == SAMPLE_RATE or len(audio) == 0:
+        return audio
+    duration = len(audio) / sampling_rate
+    target_len = int(round(duration * SAMPLE_RATE))
+    src_t = np.arange(len(audio), dtype=np.float64) / sampling_rate
+    dst_t = np.arange(target_len, dtype=np.float64) / SAMPLE_RATE
+    return np.interp(dst_t, src_t, audio).astype(np.float32)
+
+
+def _decode_wav(data: bytes) -> np.ndarray | None:
+    """Fast path for plain PCM WAV uploads; returns None if it isn't one"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if width == 2:
+        pcm = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        pcm = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif width == 1:
+        pcm = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        return None
+
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1)
+    return resample(pcm, rate)
+
+
+def load_audio(audio, sampling_rate: int | None = None):
+    """
+    Turn a submission into something WhisperModel.transcribe accepts:
+      - str path: returned unchanged
+      - NumPy buffer: mono float32, resampled to 16 kHz if `sampling_rate` says otherwise
+      - bytes: decoded in memory (WAV fast path, then PyAV); a temp file is only
+        used for containers PyAV can't read from memory
+    """
+    if isinstance(audio, str):
+        return audio
+
+    if isinstance(audio, np.ndarray):
+        pcm = audio.astype(np.float32, copy=False)
+        if pcm.ndim > 1:
+            pcm = pcm.mean(axis=1)
+        return resample(pcm, sampling_rate or SAMPLE_RATE)
+
+    data = bytes(audio)
+    pcm = _decode_wav(data)
+    if pcm is not None:
+        return pcm
+
+    try:
+        return decode_audio(io.BytesIO(data), sampling_rate=SAMPLE_RATE)
+    except Exception:
+        # Some containers need a real file to seek around in
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            tmp.write(data)
+            tmp_path = tmp.name
+        try:
+            return decode_audio(tmp_path, sampling_rate=SAMPLE_RATE)
+        finally:
+            os.unlink(tmp_path)
 
 
 class audio_stt:
@@ -9,6 +101,9 @@ class audio_stt:
         model_name: str = "base",
         device: str | None = None,
         language: str | None = "en",
+        num_workers: int = 1,
+        batch_size: int = 1,
+        batch_window: float = 0.05,
     ):
         # faster-whisper uses "cpu" or "cuda"
         self.device = device or "cpu"
@@ -22,50 +117,347 @@ class audio_stt:
         # compute_type: int8 is good + fast on CPU
         compute_type = "int8" if self.device == "cpu" else "float16"
 
-        self.model = WhisperModel(
-            model_name,
-            device=self.device,
-            compute_type=compute_type,
-        )
+        # Split the CPU cores between the workers so they don't fight each other
+        self.num_workers = max(1, num_workers)
+        cpu_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+
+        # One WhisperModel per worker; every worker pulls from the same
+        # audio_queue, so whichever one is free picks up the next job.
+        self.models = [
+            WhisperModel(
+                model_name,
+                device=self.device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+            )
+            for _ in range(self.num_workers)
+        ]
+        self.model = self.models[0]
+
+        # batch_size > 1: each worker gathers up to batch_size clips (waiting at
+        # most batch_window seconds) and runs them through one batched pass.
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.pipelines = [BatchedInferencePipeline(model=m) for m in self.models]
+        worker = self._batch_worker if self.batch_size > 1 else self._worker
 
         self.audio_queue = queue.Queue()
         self.text_queue = queue.Queue()
 
-        self.thread = threading.Thread(target=self._worker, daemon=True)
-        self.thread.start()
+        # Per-worker counters for stats()
+        self.started_at = time.time()
+        self.busy = [False] * self.num_workers
+        self.jobs_done = [0] * self.num_workers
+        self.busy_seconds = [0.0] * self.num_workers
+
+        self.threads = [
+            threading.Thread(target=worker, args=(i,), daemon=True)
+            for i in range(self.num_workers)
+        ]
+        self.thread = self.threads[0]
+        for thread in self.threads:
+            thread.start()
 
-    def _worker(self):
+    def _worker(self, worker_id: int = 0):
+        model = self.models[worker_id]
         while True:
-            audio_path = self.audio_queue.get()
-            if audio_path is None:
+            job = self.audio_queue.get()
+            if job is None:
+                self.audio_queue.task_done()
                 break
 
+            # Jobs are (audio, sampling_rate, future); future is None for the
+            # legacy STT()/get_text() path, which still reports via text_queue.
+            audio, sampling_rate, future = job
+
+            # Skip work the caller already cancelled (or timed out on)
+            if future is not None and not future.set_running_or_notify_cancel():
+                self.audio_queue.task_done()
+                continue
+
+            self.busy[worker_id] = True
+            start = time.perf_counter()
             try:
-                segments, info = self.model.transcribe(
-                    audio_path,
+                segments, info = model.transcribe(
+                    load_audio(audio, sampling_rate),
                     language=self.language,
                 )
                 text = "".join(seg.text for seg in segments).strip()
-                self.text_queue.put(text)
+                self._deliver(future, text)
             except Exception as e:
-                # Return error as text so your server doesn't silently hang
-                self.text_queue.put(f"[STT ERROR] {e}")
+                self._deliver(future, error=e)
             finally:
+                self.busy_seconds[worker_id] += time.perf_counter() - start
+                self.jobs_done[worker_id] += 1
+                self.busy[worker_id] = False
+                self.audio_queue.task_done()
+
+    def _batch_worker(self, worker_id: int = 0):
+        pipeline = self.pipelines[worker_id]
+        running = True
+        while running:
+            job = self.audio_queue.get()
+            if job is None:
                 self.audio_queue.task_done()
+                break
+
+            # Gather more clips until the batch is full or the window closes
+            jobs = [job]
+            deadline = time.perf_counter() + self.batch_window
+            while len(jobs) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self.audio_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is None:
+                    # Finish this batch, then exit
+                    self.audio_queue.task_done()
+                    running = False
+                    break
+                jobs.append(job)
+
+            # Drop jobs whose callers already gave up
+            live = []
+            for audio, sampling_rate, future in jobs:
+                if future is None or future.set_running_or_notify_cancel():
+                    live.append((audio, sampling_rate, future))
+                else:
+                    self.audio_queue.task_done()
+
+            self.busy[worker_id] = True
+            start = time.perf_counter()
+            try:
+                self._transcribe_batch(pipeline, live)
+            finally:
+                self.busy_seconds[worker_id] += time.perf_counter() - start
+                self.jobs_done[worker_id] += len(live)
+                self.busy[worker_id] = False
+                for _ in live:
+                    self.audio_queue.task_done()
+
+    def _transcribe_batch(self, pipeline: BatchedInferencePipeline, jobs: list):
+        """
+        Lay the clips out back to back in one buffer and hand their boundaries to
+        the batched pipeline as clip_timestamps, so every clip (or 30 s piece of
+        one) becomes a row of the same batch. Each output segment's `seek` is its
+        chunk offset in frames, which maps it back to the owning job.
+        """
+        pieces = []       # padded audio pieces, in buffer order
+        clips = []        # clip_timestamps for the pipeline (seconds)
+        owner = {}        # seek frame -> job index
+        offset = 0
+        ready = []
+        for i, (audio, sampling_rate, future) in enumerate(jobs):
+            try:
+                pcm = load_audio(audio, sampling_rate)
+                if isinstance(pcm, str):
+                    pcm = decode_audio(pcm, sampling_rate=SAMPLE_RATE)
+            except Exception as e:
+                self._deliver(future, error=e)
+                continue
+            ready.append(i)
+
+            for start in range(0, len(pcm), CHUNK_SAMPLES):
+                piece = pcm[start:start + CHUNK_SAMPLES]
+                if len(piece) < FRAME_SAMPLES:
+                    continue
+                # Pad to whole frames so every chunk starts on its own seek value
+                padded_len = -(-len(piece) // FRAME_SAMPLES) * FRAME_SAMPLES
+                pieces.append(np.pad(piece, (0, padded_len - len(piece))))
+                clip = {"start": offset / SAMPLE_RATE, "end": (offset + len(piece)) / SAMPLE_RATE}
+                clips.append(clip)
+                # Same arithmetic the pipeline uses to compute Segment.seek
+                seek = int(int(clip["start"] * SAMPLE_RATE) / SAMPLE_RATE * 100)
+                owner[seek] = i
+                offset += padded_len
+
+        texts = {i: [] for i in ready}
+        try:
+            if clips:
+                segments, info = pipeline.transcribe(
+                    np.concatenate(pieces),
+                    language=self.language,
+                    clip_timestamps=clips,
+                    vad_filter=False,
+                    batch_size=self.batch_size,
+                )
+                for seg in segments:
+                    texts[owner[seg.seek]].append(seg.text)
+        except Exception as e:
+            for i in ready:
+                self._deliver(jobs[i][2], error=e)
+            return
+
+        for i in ready:
+            self._deliver(jobs[i][2], "".join(texts[i]).strip())
+
+    def _deliver(self, future: Future | None, text: str = "", error: Exception | None = None):
+        """Resolve a job's Future, or push to text_queue for the legacy STT() path"""
+        if future is not None:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(text)
+        elif error is not None:
+            # Return error as text so your server doesn't silently hang
+            self.text_queue.put(f"[STT ERROR] {error}")
+        else:
+            self.text_queue.put(text)
 
     def stop(self):
-        self.audio_queue.put(None)
-        self.thread.join()
+        for _ in self.threads:
+            self.audio_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self) -> dict:
+        """Queue depth and per-worker utilization of the pool"""
+        uptime = max(time.time() - self.started_at, 1e-9)
+        return {
+            "num_workers": self.num_workers,
+            "batch_size": self.batch_size,
+            "queue_depth": self.audio_queue.qsize(),
+            "workers": [
+                {
+                    "id": i,
+                    "busy": self.busy[i],
+                    "jobs_done": self.jobs_done[i],
+                    "busy_seconds": round(self.busy_seconds[i], 3),
+                    "utilization": round(min(self.busy_seconds[i] / uptime, 1.0), 4),
+                }
+                for i in range(self.num_workers)
+            ],
+        }
+
+    def submit(self, audio, sampling_rate: int | None = None) -> Future:
+        """
+        Queue audio for transcription; the returned Future resolves to its text.
+        `audio` can be a file path, raw file bytes or a float32 NumPy buffer
+        (pass `sampling_rate` if it isn't 16 kHz).
+        """
+        future = Future()
+        self.audio_queue.put((audio, sampling_rate, future))
+        return future
+
+    async def transcribe(
+        self,
+        audio,
+        timeout: float | None = None,
+        sampling_rate: int | None = None,
+    ) -> str:
+        """
+        Await the transcription of one submission without blocking the event loop.
+        Raises asyncio.TimeoutError after `timeout` seconds; cancelling (or timing
+        out) drops the job if no worker has picked it up yet.
+        """
+        future = asyncio.wrap_future(self.submit(audio, sampling_rate))
+        return await asyncio.wait_for(future, timeout)
 
     def STT(self, audio_path: str):
         """Submit an audio file for transcription"""
-        self.audio_queue.put(audio_path)
+        self.audio_queue.put((audio_path, None, None))
 
     def get_text(self) -> str:
         """Blocking get of transcription result"""
         return self.text_queue.get()
 
 
+class stt_stream:
+    """
+    Incremental transcription for one streaming client.
+    feed() takes little-endian PCM16 mono chunks and returns transcript events:
+      {"type": "partial", "text": ...}  while the speaker is still talking
+      {"type": "final", "text": ...}    once VAD sees the segment has ended
+    """
+
+    def __init__(
+        self,
+        stt: audio_stt,
+        sampling_rate: int = SAMPLE_RATE,
+        vad_interval: float = 0.5,
+        partial_interval: float = 1.0,
+        min_silence_ms: int = 500,
+        max_segment_seconds: float = 25.0,
+        timeout: float | None = None,
+    ):
+        if sampling_rate <= 0:
+            raise ValueError(f"sampling_rate must be positive, got {sampling_rate}")
+        self.stt = stt
+        self.sampling_rate = sampling_rate
+        self.vad_options = VadOptions(min_silence_duration_ms=min_silence_ms, speech_pad_ms=200)
+        self.vad_step = int(vad_interval * SAMPLE_RATE)
+        self.partial_step = int(partial_interval * SAMPLE_RATE)
+        self.silence_samples = int(min_silence_ms / 1000 * SAMPLE_RATE)
+        self.max_segment = int(max_segment_seconds * SAMPLE_RATE)
+        self.timeout = timeout
+
+        self.buffer = np.zeros(0, dtype=np.float32)  # current (unfinished) segment, 16 kHz
+        self.carry = b""          # odd trailing byte of the last frame (half a sample)
+        self.unchecked = 0        # samples received since the last VAD pass
+        self.since_partial = 0    # samples received since the last partial transcript
+        self.last_partial = ""
+        self.segments = 0
+
+    async def feed(self, chunk: bytes) -> list:
+        """Add a PCM16 chunk; returns any partial/final events it produced"""
+        chunk = self.carry + chunk
+        # Frames needn't end on a sample boundary; keep the odd byte for the next one
+        usable = len(chunk) - len(chunk) % 2
+        chunk, self.carry = chunk[:usable], chunk[usable:]
+        pcm = np.frombuffer(chunk, dtype="<i2").astype(np.float32) / 32768.0
+        pcm = resample(pcm, self.sampling_rate)
+        self.buffer = np.concatenate([self.buffer, pcm])
+        self.unchecked += len(pcm)
+        self.since_partial += len(pcm)
+
+        if self.unchecked < self.vad_step:
+            return []
+        self.unchecked = 0
+
+        speech = await asyncio.to_thread(get_speech_timestamps, self.buffer, self.vad_options)
+        if not speech:
+            # Nothing said yet; keep only a short tail so silence doesn't pile up
+            self.buffer = self.buffer[-self.silence_samples:]
+            self.since_partial = 0
+            return []
+
+        speech_end = speech[-1]["end"]
+        if len(self.buffer) - speech_end >= self.silence_samples or len(self.buffer) >= self.max_segment:
+            return await self._finish_segment(min(len(self.buffer), speech_end + self.silence_samples))
+
+        if self.since_partial >= self.partial_step:
+            self.since_partial = 0
+            text = await self.stt.transcribe(self.buffer, timeout=self.timeout)
+            if text and text != self.last_partial:
+                self.last_partial = text
+                return [{"type": "partial", "text": text, "segment": self.segments}]
+        return []
+
+    async def flush(self) -> list:
+        """Client finished talking: finalize whatever speech is left in the buffer"""
+        if len(self.buffer) == 0:
+            return []
+        speech = await asyncio.to_thread(get_speech_timestamps, self.buffer, self.vad_options)
+        if not speech:
+            self.buffer = np.zeros(0, dtype=np.float32)
+            return []
+        return await self._finish_segment(len(self.buffer))
+
+    async def _finish_segment(self, end: int) -> list:
+        segment, self.buffer = self.buffer[:end], self.buffer[end:]
+        self.unchecked = len(self.buffer)
+        self.since_partial = 0
+        self.last_partial = ""
+
+        text = await self.stt.transcribe(segment, timeout=self.timeout)
+        event = {"type": "final", "text": text, "segment": self.segments}
+        self.segments += 1
+        return [event] if text else []
+
+
 # import threading
 # import queue
 # import torch
@@ -1,15 +1,19 @@
+import asyncio
 import threading
 import queue
-from elevenlabs.client import ElevenLabs
+import httpx
+from elevenlabs.client import ElevenLabs, AsyncElevenLabs
 from elevenlabs.play import play
 import json
+from app.tts_cache import TTSCache
 
 
 class audio_tts:
-    def __init__(self, api_key: str, voice_id: str, model_id: str):
+    def __init__(self, api_key: str, voice_id: str, model_id: str, cache: TTSCache | None = None):
         self.client = ElevenLabs(api_key=api_key)
         self.voice_id = voice_id
         self.model_id = model_id
+        self.cache = cache
         self.text_queue = queue.Queue()
         self.audio_queue = queue.Queue()
         self.thread = threading.Thread(target=self._worker)
@@ -23,12 +27,17 @@ class audio_tts:
             text = data.get("clean_text", "")
             command = data.get("commands", "")
 
-            audio = self.client.text_to_speech.convert(
-                text=text,
-                voice_id=self.voice_id,
-                model_id=self.model_id,
-                output_format="mp3_44100_128",
-            )
+            key = TTSCache.key(text, self.voice_id, self.model_id, "mp3_44100_128")
+            audio = self.cache.get(key) if self.cache else None
+            if audio is None:
+                audio = b"".join(self.client.text_to_speech.convert(
+                    text=text,
+                    voice_id=self.voice_id,
+                    model_id=self.model_id,
+                    output_format="mp3_44100_128",
+                ))
+                if self.cache:
+                    self.cache.put(key, audio)
             play(audio)
 
             self.audio_queue.put((audio, command))
@@ -58,3 +67,68 @@ class audio_tts:
     def get_audio_chunk(self):
         return self.audio_queue.get()
 
+
+class async_tts:
+    """
+    Shared async ElevenLabs client for the API server.
+    Built once: one keep-alive httpx pool, at most `max_concurrency` syntheses
+    in flight, and a `timeout` on every call so a stuck request can't hang a reply.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        voice_id: str = "21m00Tcm4TlvDq8ikWAM",  # Rachel voice
+        model_id: str = "eleven_turbo_v2_5",
+        output_format: str = "mp3_44100_128",
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+        cache: TTSCache | None = None,
+        base_url: str | None = None,
+    ):
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+        self.timeout = timeout
+        self.cache = cache
+
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+                keepalive_expiry=60.0,
+            ),
+        )
+        self.client = AsyncElevenLabs(api_key=api_key, base_url=base_url, httpx_client=self.http)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(self, text: str) -> bytes:
+        """Synthesize `text` and return the audio bytes (cache hits skip ElevenLabs)"""
+        key = None
+        if self.cache:
+            key = TTSCache.key(text, self.voice_id, self.model_id, self.output_format)
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+
+        async with self.semaphore:
+            audio = await asyncio.wait_for(self._convert(text), self.timeout)
+
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, key, audio)
+        return audio
+
+    async def _convert(self, text: str) -> bytes:
+        chunks = []
+        async for chunk in self.client.text_to_speech.convert(
+            text=text,
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            output_format=self.output_format,
+        ):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def aclose(self):
+        await self.http.aclose()
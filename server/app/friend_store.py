@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class FriendStore:
+    """
+    Dict-like friend storage used by the API (`friend_id in store`,
+    `store[friend_id]`, `store[friend_id] = data`, `store.items()`).
+
+    Only JSON-serializable metadata is persisted: the live Backboard `client`
+    inside assistant_info is dropped on write, and chats use the process-wide
+    shared client instead, so several uvicorn workers can share one backend.
+
+    This base class keeps everything in memory; subclasses override the
+    _load/_save/_load_all hooks to persist.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, dict] = {}
+
+    # ---- storage hooks ----
+
+    def _load(self, friend_id: str) -> Optional[dict]:
+        return self.rows.get(friend_id)
+
+    def _save(self, friend_id: str, data: dict):
+        self.rows[friend_id] = data
+
+    def _load_all(self) -> Dict[str, dict]:
+        return dict(self.rows)
+
+    # ---- dict-like API ----
+
+    def __contains__(self, friend_id: str) -> bool:
+        return self._load(friend_id) is not None
+
+    def __getitem__(self, friend_id: str) -> dict:
+        data = self.get(friend_id)
+        if data is None:
+            raise KeyError(friend_id)
+        return data
+
+    def __setitem__(self, friend_id: str, data: dict):
+        data = dict(data)
+        assistant_info = dict(data.get("assistant_info") or {})
+        assistant_info.pop("client", None)
+        data["assistant_info"] = assistant_info
+        self._save(friend_id, data)
+
+    def get(self, friend_id: str, default=None) -> Optional[dict]:
+        data = self._load(friend_id)
+        if data is None:
+            return default
+        return self._copy(data)
+
+    def items(self):
+        return [(friend_id, self._copy(data)) for friend_id, data in self._load_all().items()]
+
+    @staticmethod
+    def _copy(data: dict) -> dict:
+        # Callers edit what they get; the cached row must stay untouched
+        data = dict(data)
+        data["assistant_info"] = dict(data.get("assistant_info") or {})
+        return data
+
+
+class SQLiteFriendStore(FriendStore):
+    """
+    Friends persisted in an embedded SQLite database (WAL mode, keyed by
+    friend_id), with a small read-through cache in front. Cached rows expire
+    after `cache_ttl` seconds so updates from other workers show up.
+    """
+
+    def __init__(self, path: str, cache_ttl: float = 30.0):
+        super().__init__()
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self.cache: Dict[str, tuple] = {}  # friend_id -> (data, expires_at)
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS friends ("
+            " friend_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " created_at REAL,"
+            " updated_at REAL"
+            ")"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS friends_created_at ON friends (created_at)")
+
+    def _load(self, friend_id: str) -> Optional[dict]:
+        now = time.monotonic()
+        cached = self.cache.get(friend_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM friends WHERE friend_id = ?", (friend_id,)).fetchone()
+        if row is None:
+            self.cache.pop(friend_id, None)
+            return None
+        data = json.loads(row[0])
+        self.cache[friend_id] = (data, now + self.cache_ttl)
+        return data
+
+    def _save(self, friend_id: str, data: dict):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO friends (friend_id, data, created_at, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(friend_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (friend_id, json.dumps(data), data.get("created_at", now), now),
+            )
+        self.cache[friend_id] = (data, time.monotonic() + self.cache_ttl)
+
+    def _load_all(self) -> Dict[str, dict]:
+        with self.lock:
+            rows = self.conn.execute("SELECT friend_id, data FROM friends ORDER BY created_at").fetchall()
+        return {friend_id: json.loads(data) for friend_id, data in rows}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def create_friend_store(backend: str, path: str) -> FriendStore:
+    """Build the friend store selected by FRIEND_STORE ("sqlite" or "memory")"""
+    if backend == "memory":
+        return FriendStore()
+    if backend == "sqlite":
+        return SQLiteFriendStore(path)
+    raise ValueError(f"Unknown friend store backend: {backend}")
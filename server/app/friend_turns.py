@@ -0,0 +1,126 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Tuple
+
+from app.metrics import observe_stage
+
+
+class _FriendState:
+    def __init__(self):
+        self.lock = asyncio.Lock()  # one turn at a time on the friend's thread
+        self.batch = None           # messages waiting to become the next turn
+        self.users = 0
+
+
+class _Batch:
+    def __init__(self):
+        self.messages = []
+        self.futures = []
+
+
+class FriendTurns:
+    """
+    Serializes conversation turns per friend_id, since every turn goes to the
+    friend's single Backboard thread, and coalesces bursts of messages.
+    Messages sent while the previous turn is still running, or within
+    `window` seconds of each other, are joined into one turn, which cuts LLM
+    calls when a user double-taps or types in fragments. The reply goes to the
+    sender of the last merged message only; the others get None, so a client
+    shows it once. A non-zero `window` delays every turn by that much, so it
+    defaults to 0 (merge only behind a running turn). Streaming callers that
+    can't share a reply use `turn()` to take the lock without coalescing.
+    """
+
+    def __init__(self, window: float = 0.0, separator: str = "\n"):
+        self.window = window
+        self.separator = separator
+        self.friends: Dict[str, _FriendState] = {}
+        self.tasks = set()
+
+        self.turns = 0
+        self.messages = 0
+
+    async def submit(self, friend_id: str, message: str, handler: Callable[[str], Awaitable]) -> Tuple[object, int]:
+        """
+        Queue `message` for the friend's next turn and wait for its reply.
+        Returns (handler result for the merged turn, number of messages merged);
+        the result is None unless `message` was the last one merged.
+        The first message of a turn decides which `handler` runs it.
+        """
+        state = self._acquire(friend_id)
+        try:
+            self.messages += 1
+            batch = state.batch
+            if batch is None:
+                batch = state.batch = _Batch()
+                task = asyncio.create_task(self._run(friend_id, state, batch, handler))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            future = asyncio.get_running_loop().create_future()
+            batch.messages.append(message)
+            batch.futures.append(future)
+            return await future
+        finally:
+            self._release(friend_id, state)
+
+    @asynccontextmanager
+    async def turn(self, friend_id: str):
+        """Hold the friend's turn for the enclosed block (no coalescing)"""
+        state = self._acquire(friend_id)
+        try:
+            start = time.perf_counter()
+            async with state.lock:
+                observe_stage("turn_wait", time.perf_counter() - start)
+                self.turns += 1
+                self.messages += 1
+                yield
+        finally:
+            self._release(friend_id, state)
+
+    def stats(self) -> dict:
+        return {
+            "window": self.window,
+            "active_friends": len(self.friends),
+            "turns": self.turns,
+            "messages": self.messages,
+            "coalesced": self.messages - self.turns,
+        }
+
+    async def _run(self, friend_id: str, state: _FriendState, batch: _Batch, handler: Callable[[str], Awaitable]):
+        state.users += 1
+        try:
+            start = time.perf_counter()
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+            async with state.lock:
+                # Close the batch; later messages start the next turn
+                state.batch = None
+                observe_stage("turn_wait", time.perf_counter() - start)
+                self.turns += 1
+                try:
+                    result = await handler(self.separator.join(batch.messages))
+                except Exception as e:
+                    for future in batch.futures:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    # Only the sender that closed the batch gets the reply
+                    last = batch.futures[-1]
+                    for future in batch.futures:
+                        if not future.done():
+                            future.set_result((result if future is last else None, len(batch.messages)))
+        finally:
+            self._release(friend_id, state)
+
+    def _acquire(self, friend_id: str) -> _FriendState:
+        state = self.friends.get(friend_id)
+        if state is None:
+            state = self.friends[friend_id] = _FriendState()
+        state.users += 1
+        return state
+
+    def _release(self, friend_id: str, state: _FriendState):
+        state.users -= 1
+        if state.users == 0 and state.batch is None:
+            self.friends.pop(friend_id, None)
@@ -1,13 +1,36 @@
 import asyncio
 import os
 import sys
+import json
 import base64
+import logging
 from dotenv import load_dotenv
 import google.generativeai as genai
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
 
+logger = logging.getLogger(__name__)
+
+_gemini_configured = False
+
+ASSISTANT_PROMPT = (
+    'Look at the main object in this image and respond in JSON with two fields. '
+    '"name": ONLY the name of the object, nothing else (for example "AirPods" or "Dog" or "Car"). '
+    '"description": describe this image in detail by speaking directly to the main object '
+    'in second person (using "you"). Start with: "You are a ____."'
+)
+
+ASSISTANT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "description": {"type": "string"},
+    },
+    "required": ["name", "description"],
+}
+
+
 def analyze_image_with_gemini(image_path: str) -> str:
     """
     Use Google Gemini to analyze the image and return a description.
@@ -51,6 +74,69 @@ def analyze_image_with_gemini(image_path: str) -> str:
     
     return description.strip()
 
+
+def configure_gemini():
+    """
+    Configure Gemini once per process instead of on every call.
+    """
+    global _gemini_configured
+    if _gemini_configured:
+        return
+    
+    gemini_key = os.getenv('GEMINI_API_KEY')
+    if not gemini_key:
+        raise ValueError("GEMINI_API_KEY not found in environment")
+    
+    genai.configure(api_key=gemini_key)
+    _gemini_configured = True
+
+
+def get_media_type(image_path: str) -> str:
+    if image_path.lower().endswith('.png'):
+        return "image/png"
+    return "image/jpeg"  # default (also .jpg / .jpeg)
+
+
+def _read_image(image_path: str) -> bytes:
+    with open(image_path, 'rb') as f:
+        return f.read()
+
+
+async def analyze_image_for_assistant(image_path: str, image_data: bytes = None) -> dict:
+    """
+    Use ONE async Gemini call to get both the object's name and the
+    second-person description, as structured JSON:
+      {"name": "AirPods", "description": "You are a ..."}
+    The image is read once and sent as raw bytes (no manual base64 step);
+    pass `image_data` to reuse bytes already in memory.
+    """
+    configure_gemini()
+    
+    if image_data is None:
+        image_data = await asyncio.to_thread(_read_image, image_path)
+    image_part = {
+        "mime_type": get_media_type(image_path),
+        "data": image_data
+    }
+    
+    logger.debug(f"📸 Sending image to Gemini for name + description...")
+    
+    model = genai.GenerativeModel(
+        'gemini-2.5-flash-lite',
+        generation_config={
+            "response_mime_type": "application/json",
+            "response_schema": ASSISTANT_SCHEMA,
+        },
+    )
+    response = await model.generate_content_async([ASSISTANT_PROMPT, image_part])
+    result = json.loads(response.text)
+    
+    return {
+        "name": result["name"].strip(),
+        "description": result["description"].strip(),
+    }
+
+
 def main(image_path: str):
     """
     Main flow: analyze image with Gemini and print description
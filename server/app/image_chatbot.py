@@ -2,19 +2,25 @@ import asyncio
 import os
 import sys
 import json
+import httpx
+import logging
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
 from backboard import BackboardClient
 from app.llm_parser import StreamParser
+from app.metrics import span, observe_stage
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
-# Import the image analyzer function
-from app.image_analyzer import analyze_image_with_gemini
+# Import the image analyzer functions
+from app.image_analyzer import analyze_image_with_gemini, analyze_image_for_assistant
 target_chunk_size = 250  # max characters per chunk
 
+logger = logging.getLogger(__name__)
+
 def generate_name_from_image(image_path: str) -> str:
     """
     Use Google Gemini to generate a name for the object in the image.
@@ -57,48 +63,116 @@ def generate_name_from_image(image_path: str) -> str:
     
     return name
 
-async def create_chatbot_assistant(image_path: str, chatbot_name: str = None) -> dict:
+# One process-wide Backboard client shared by every assistant
+_backboard_client = None
+# Serializes lazy creation, so concurrent first calls don't each build a pool
+_backboard_lock = asyncio.Lock()
+_backboard_stats = {"requests": 0, "connections_opened": 0}
+
+async def _count_connection(event_name: str, info: dict):
+    if event_name == "connection.connect_tcp.complete":
+        _backboard_stats["connections_opened"] += 1
+
+async def _count_request(request: httpx.Request):
+    _backboard_stats["requests"] += 1
+    # httpcore reports connection open/close through the trace extension
+    request.extensions["trace"] = _count_connection
+
+async def init_backboard_client(max_connections: int = 20, keepalive_expiry: float = 60.0, timeout: float = 30.0) -> BackboardClient:
+    """
+    Build the shared Backboard client (call once, from the app lifespan).
+    The SDK creates its own default httpx client, so it is swapped for one
+    with a tuned keep-alive pool and request/connection counters (the
+    default one is closed first, so it doesn't leak).
+    """
+    global _backboard_client
+    
+    api_key = os.getenv('BACKBOARD_API_KEY')
+    if not api_key:
+        raise ValueError("BACKBOARD_API_KEY not found in environment")
+    
+    # BACKBOARD_BASE_URL points the SDK at another deployment (or a local stand-in)
+    base_url = os.getenv('BACKBOARD_BASE_URL')
+    client = BackboardClient(api_key=api_key, timeout=timeout, **({"base_url": base_url} if base_url else {}))
+    default_client = client._client
+    client._client = httpx.AsyncClient(
+        headers=default_client.headers,
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        event_hooks={"request": [_count_request]},
+    )
+    await default_client.aclose()
+    _backboard_client = client
+    return client
+
+async def get_backboard_client() -> BackboardClient:
+    """
+    Return the shared Backboard client, creating it on first use.
+    """
+    if _backboard_client is None:
+        async with _backboard_lock:
+            if _backboard_client is None:
+                return await init_backboard_client()
+    return _backboard_client
+
+async def close_backboard_client():
+    global _backboard_client
+    if _backboard_client is not None:
+        await _backboard_client.aclose()
+        _backboard_client = None
+
+def backboard_stats() -> dict:
+    """
+    Connection reuse of the shared client: sockets opened vs requests served.
+    """
+    opened = _backboard_stats["connections_opened"]
+    # Sockets currently held by the httpx pool (idle keep-alive + in use)
+    transport = getattr(_backboard_client._client, "_transport", None) if _backboard_client else None
+    pool = getattr(transport, "_pool", None)
+    return {
+        **_backboard_stats,
+        "connections_open": len(pool.connections) if pool is not None else 0,
+        "requests_per_connection": round(_backboard_stats["requests"] / opened, 2) if opened else 0.0,
+    }
+
+async def create_chatbot_assistant(image_path: str, chatbot_name: str = None, image_data: bytes = None) -> dict:
     """
     Create a Backboard assistant from an image.
+    `image_data` (the image's bytes, if already loaded) skips re-reading the file.
     """
     # Validate image exists
-    if not os.path.exists(image_path):
+    if image_data is None and not os.path.exists(image_path):
         raise FileNotFoundError(f"Image not found: {image_path}")
     
-    print(f"📸 Analyzing image: {image_path}\n")
+    logger.debug(f"📸 Analyzing image: {image_path}")
     
-    # Step 1: Generate name
-    print("🏷️  Generating name for object...")
-    object_name = generate_name_from_image(image_path)
-    print(f"✓ Object name: {object_name}\n")
-    
-    # Step 2: Generate description
-    print("📝 Generating description...")
-    description = analyze_image_with_gemini(image_path)
-    print(f"✓ Description generated!\n")
+    # Step 1: Generate name + description in one structured Gemini call
+    with span("image_analysis"):
+        analysis = await analyze_image_for_assistant(image_path, image_data)
+    object_name = analysis["name"]
+    description = analysis["description"]
+    logger.debug(f"✓ Object name: {object_name}")
     
     # Use provided name or generated name
     if chatbot_name is None:
         chatbot_name = object_name
     
-    # Step 3: Create Backboard assistant
-    print(f"🤖 Creating assistant '{chatbot_name}'...")
-    api_key = os.getenv('BACKBOARD_API_KEY')
-    if not api_key:
-        raise ValueError("BACKBOARD_API_KEY not found in environment")
+    # Step 2: Create Backboard assistant (starts as soon as the description is ready)
+    client = await get_backboard_client()
     
-    client = BackboardClient(api_key=api_key)
-    
-    assistant = await client.create_assistant(
-        name=chatbot_name,
-        description=description + f"Include one-word actions (e.g. JUMP, WAVE, WOBBLE) within your messages with [[ACTION]] markers."
-    )
-    print(f"✓ Assistant created: {assistant.assistant_id}")
-    
-    # Create thread
-    print("📝 Creating thread...")
-    thread = await client.create_thread(assistant.assistant_id)
-    print(f"✓ Thread created: {thread.thread_id}\n")
+    with span("assistant_create"):
+        assistant = await client.create_assistant(
+            name=chatbot_name,
+            description=description + f"Include one-word actions (e.g. JUMP, WAVE, WOBBLE) within your messages with [[ACTION]] markers."
+        )
+        
+        # Create thread
+        thread = await client.create_thread(assistant.assistant_id)
+    logger.debug(f"✓ Assistant '{chatbot_name}' created: {assistant.assistant_id}, thread {thread.thread_id}")
     
     return {
         "name": chatbot_name,
@@ -109,24 +183,26 @@ async def create_chatbot_assistant(image_path: str, chatbot_name: str = None) ->
         "client": client
     }
 
-async def interactive_chat(assistant_info: dict, user_prompt: str = None):
+async def interactive_chat(assistant_info: dict, user_prompt: str = None, min_chunk_size: int = target_chunk_size, memory: bool = False):
     """
     Interactive chat loop with the assistant.
     Yields cleaned text and commands for each response.
     If user_prompt is provided, uses that instead of input().
+    Text is batched until a command arrives or min_chunk_size characters
+    accumulate; pass min_chunk_size=1 to get every parser update as it happens.
+    memory=True turns on Backboard's conversation memory for the message.
     """
     thread_id = assistant_info['thread_id']
-    client = assistant_info['client']
+    client = assistant_info.get('client') or await get_backboard_client()
     assistant_name = assistant_info['name']
 
-    parser = StreamParser()
+    parser = StreamParser(keep_history=False)
     text_buffer = ""
     
-    print(f"✓ Starting chat with '{assistant_name}'")
+    logger.debug(f"✓ Starting chat with '{assistant_name}'")
     
     if user_prompt:
         user_input = user_prompt
-        print(f"📨 Processing prompt: {user_input}\n")
     else:
         print("Type 'exit', 'quit', or 'bye' to end the conversation.\n")
         
@@ -142,25 +218,32 @@ async def interactive_chat(assistant_info: dict, user_prompt: str = None):
             
             break
     
-    print(f"{assistant_name}: ", end="", flush=True)
+    start = time.perf_counter()
+    first_token = True
+    parse_seconds = 0.0
     async for chunk in await client.add_message(
         thread_id=thread_id,
         content=user_input,
         llm_provider="google",
         model_name="gemini-2.5-flash-lite",
-        stream=True
+        stream=True,
+        **({"memory": "Auto"} if memory else {})
     ):
         if chunk.get('type') == 'content_streaming':
             raw_text = chunk['content']
+            if first_token:
+                observe_stage("llm_first_token", time.perf_counter() - start)
+                first_token = False
         
             # Calls llm_parser to parse chunk
+            parse_start = time.perf_counter()
             clean_segment, new_cmds = parser.parse_chunk(raw_text)
+            parse_seconds += time.perf_counter() - parse_start
             text_buffer += clean_segment
-            print(clean_segment, end="", flush=True)
 
             # Only yield when we have commands or reach chunk size
             if new_cmds:
-                print(f"\n[CMD: {new_cmds}]", end="", flush=True)
+                logger.debug(f"[CMD: {new_cmds}]")
                 yield {
                     "clean_text": text_buffer,
                     "commands": new_cmds, 
@@ -168,7 +251,7 @@ async def interactive_chat(assistant_info: dict, user_prompt: str = None):
                 }
                 text_buffer = ""
             
-            elif len(text_buffer) >= target_chunk_size: 
+            elif len(text_buffer) >= min_chunk_size: 
                 yield {
                     "clean_text": text_buffer,
                     "commands": [], 
@@ -178,23 +261,18 @@ async def interactive_chat(assistant_info: dict, user_prompt: str = None):
         
         elif chunk['type'] == 'message_complete':
             # Wait for message_complete, then finalize and yield everything
-            print("\n[COMPLETE]", flush=True)
-            final_data = parser.finalize()
-            
-            # Combine any remaining text with finalized data
-            remaining_text = text_buffer
-            if final_data.get("clean_text") and remaining_text not in final_data.get("clean_text", ""):
-                remaining_text = text_buffer + final_data.get("clean_text", "")
-            else:
-                remaining_text = text_buffer or final_data.get("clean_text", "")
+            observe_stage("llm_complete", time.perf_counter() - start)
+            observe_stage("parse", parse_seconds)
+            # finalize() flushes an unfinished '[' / '[[' the parser was holding
+            # back; everything else was already yielded above
+            remaining_text = text_buffer + parser.finalize()["tail"]
             
-            # Always yield the final message
+            # Always yield the final message (commands were already sent as they arrived)
             yield {
                 "clean_text": remaining_text.strip(),
-                "commands": final_data.get("commands", []),
+                "commands": [],
                 "is_end": True
             }
-            print()
             break 
             #             "is_end": False
             #         }
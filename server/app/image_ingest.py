@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import io
+import os
+import uuid
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Longest edge sent to the vision model; Gemini tiles images at 768px, so more is wasted tokens
+DEFAULT_MAX_SIZE = 1024
+
+
+class ImageTooLarge(ValueError):
+    """The upload exceeded the configured size limit"""
+
+
+async def save_upload(upload: UploadFile, path: str, max_bytes: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> int:
+    """
+    Copy an upload to `path` chunk by chunk (never the whole file in memory),
+    with the disk writes off the event loop. Returns the number of bytes written.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await upload.read(chunk_size):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ImageTooLarge(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+                await asyncio.to_thread(f.write, chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware capping the request body of upload routes before it is
+    parsed. Starlette spools a whole multipart body to disk before the
+    endpoint runs, so the endpoint's own check comes too late: a declared
+    Content-Length over the limit is refused without reading the body, and
+    a body without one is counted as it streams and cut off once it passes
+    the limit. `limits` maps route path -> max body bytes.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            return await self.app(scope, receive, send)
+
+        error = f"Upload is larger than {max_bytes // (1024 * 1024)} MB"
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > max_bytes:
+            response = JSONResponse(content={"success": False, "error": error}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing as is
+                    raise HTTPException(status_code=413, detail=error)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def normalize_image(path: str, max_size: int = DEFAULT_MAX_SIZE, quality: int = 85) -> bytes:
+    """
+    Decode the image at `path` once, apply its EXIF rotation, shrink it to
+    `max_size` px on the longest edge and rewrite it in place as JPEG.
+    Returns the JPEG bytes (CPU-bound; run in a worker thread).
+    """
+    try:
+        with Image.open(path) as img:
+            img.draft("RGB", (max_size, max_size))  # JPEGs decode directly at a reduced scale
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                # Flatten transparency onto white rather than black
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            out = io.BytesIO()
+            img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Unreadable, truncated, oversized or undecodable: don't leave it on disk
+        os.remove(path)
+        raise ValueError("Uploaded file is not a supported image")
+
+    data = out.getvalue()
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return data
+
+
+def data_url(data: bytes, media_type: str = "image/jpeg") -> str:
+    return f"data:{media_type};base64,{base64.b64encode(data).decode()}"
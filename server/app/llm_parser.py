@@ -3,11 +3,45 @@ from typing import Optional, Tuple, Dict, Any
 
 CMD_RE = re.compile(r"\[\[(.*?)\]\]", re.DOTALL)
 
+# Scanner states
+TEXT = 0        # plain text
+OPEN = 1        # saw one '[' (maybe the start of '[[')
+CMD = 2         # inside '[[ ... '
+CLOSE = 3       # inside a command and saw one ']' (maybe the start of ']]')
+
+
 class StreamParser:
-    def __init__(self):
-        self.buffer = ""
-        self.clean_text = ""   # full history
-        self.commands = []     # list of commands (strings)
+    """
+    Incremental [[COMMAND]] scanner.
+    State carries over between chunks, so each chunk is scanned exactly once
+    and only its new characters are looked at; nothing already emitted is
+    rescanned or re-sliced. Same results as CMD_RE (first '[[' up to the
+    first following ']]').
+    """
+
+    def __init__(self, keep_history: bool = True):
+        self.state = TEXT
+        self.cmd_parts = []            # pieces of the command being read
+        self.keep_history = keep_history
+        self.history = []              # clean text pieces (only if keep_history)
+        self.commands = []             # list of commands (only if keep_history)
+
+    @property
+    def clean_text(self) -> str:
+        """Full clean text so far (empty unless keep_history)"""
+        if len(self.history) > 1:
+            self.history[:] = ["".join(self.history)]
+        return self.history[0] if self.history else ""
+
+    @property
+    def buffer(self) -> str:
+        """Text held back because it may still turn into a command"""
+        if self.state == TEXT:
+            return ""
+        if self.state == OPEN:
+            return "["
+        pending = "[[" + "".join(self.cmd_parts)
+        return pending + "]" if self.state == CLOSE else pending
 
     def parse_chunk(self, chunk: str) -> Tuple[str, list]:
         """
@@ -15,61 +49,115 @@ class StreamParser:
           - newly confirmed clean text
           - list of all completed commands found (empty list if none)
         """
-        self.buffer += chunk
-        new_clean = ""
+        out = []
         commands_found = []
+        state = self.state
+        i = 0
+        n = len(chunk)
 
-        # Extract ALL commands from the buffer
-        while True:
-            m = CMD_RE.search(self.buffer)
-            if not m:
-                break
-
-            start, end = m.span()
-            cmd = m.group(1)
-
-            # everything before [[COMMAND]] is now confirmed clean
-            text_segment = self.buffer[:start]
-            new_clean += text_segment
-            self.clean_text += text_segment
-
-            # record + emit the command
-            self.commands.append(cmd)
-            commands_found.append(cmd)
-
-            # remove through the end of this command, keep the rest for later
-            self.buffer = self.buffer[end:]
-
-        # If no full command exists, we can safely flush text that
-        # cannot be part of a future command start.
-        # Keep at most 1 '[' in case a command marker '[[' starts across chunk boundary.
-        if not commands_found:
-            last_bracket = self.buffer.rfind("[")
-            if last_bracket == -1:
-                # no possible command start
-                new_clean += self.buffer
-                self.clean_text += self.buffer
-                self.buffer = ""
-            else:
-                # flush everything before the last '['
-                flush = self.buffer[:last_bracket]
-                new_clean += flush
-                self.clean_text += flush
-                self.buffer = self.buffer[last_bracket:]
+        while i < n:
+            if state == TEXT:
+                j = chunk.find("[", i)
+                if j == -1:
+                    out.append(chunk[i:] if i else chunk)
+                    break
+                if j > i:
+                    out.append(chunk[i:j])
+                state = OPEN
+                i = j + 1
+
+            elif state == OPEN:
+                if chunk[i] == "[":
+                    state = CMD
+                    i += 1
+                else:
+                    # lone '[' was just text; rescan this char as text
+                    out.append("[")
+                    state = TEXT
+
+            elif state == CMD:
+                j = chunk.find("]", i)
+                if j == -1:
+                    self.cmd_parts.append(chunk[i:])
+                    break
+                if j > i:
+                    self.cmd_parts.append(chunk[i:j])
+                state = CLOSE
+                i = j + 1
+
+            else:  # CLOSE
+                if chunk[i] == "]":
+                    cmd = "".join(self.cmd_parts)
+                    self.cmd_parts.clear()
+                    commands_found.append(cmd)
+                    state = TEXT
+                    i += 1
+                else:
+                    # single ']' belongs to the command text
+                    self.cmd_parts.append("]")
+                    state = CMD
+
+        self.state = state
+        new_clean = out[0] if len(out) == 1 else "".join(out)
+
+        if self.keep_history:
+            if new_clean:
+                self.history.append(new_clean)
+            self.commands.extend(commands_found)
 
         return new_clean, commands_found
 
     def finalize(self) -> Dict[str, Any]:
         """
-        Flush remaining buffer as clean text.
-        (If buffer contains an unmatched '[[' it will be treated as literal text.)
+        Flush held-back text as clean text.
+        (An unmatched '[[' is treated as literal text.)
+        "tail" is just that flushed text; "clean_text" is the full history.
         """
-        if self.buffer:
-            self.clean_text += self.buffer
-            self.buffer = ""
+        tail = self.buffer
+        self.state = TEXT
+        self.cmd_parts.clear()
+        if tail and self.keep_history:
+            self.history.append(tail)
 
         return {
             "clean_text": self.clean_text,
             "commands": self.commands,
+            "tail": tail,
             "is_end": True,
         }
+
+
+# Sentence end: . ! ? or … (optionally followed by closing quotes/brackets) then whitespace
+SENTENCE_END_RE = re.compile(r"[.!?…]+[\"')\]]*\s+")
+
+
+class SentenceSplitter:
+    def __init__(self, min_chars: int = 20):
+        self.buffer = ""
+        self.min_chars = min_chars  # shorter sentences are merged into the next one
+
+    def feed(self, text: str) -> list:
+        """
+        Add streamed clean text and return any sentences that are now complete
+        (whitespace inside a sentence is collapsed to single spaces).
+        """
+        if not text:
+            return []
+        self.buffer += text
+
+        sentences = []
+        start = 0
+        for m in SENTENCE_END_RE.finditer(self.buffer):
+            sentence = " ".join(self.buffer[start:m.end()].split())
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = m.end()
+
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> list:
+        """Return whatever is left as a final sentence"""
+        rest = " ".join(self.buffer.split())
+        self.buffer = ""
+        return [rest] if rest else []
@@ -0,0 +1,151 @@
+"""
+3D generation burst: /generate-3d against a local stand-in for Meshy.
+
+Usage (from server/):
+    python -m app.meshy_bench [--requests 16] [--max-pending 4] [--meshy-seconds 2]
+
+Sends `--requests` generations for distinct images at once. Up to
+MESHY_MAX_PENDING (`--max-pending`) are accepted and run against the fake
+Meshy; the rest must get an immediate 429 with a Retry-After header. Once
+the accepted jobs have finished, one more request must be accepted again.
+Reports the time to answer each group and exits 1 if any of that fails.
+"""
+import argparse
+import asyncio
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.model_optimizer import write_glb
+from app.pipeline_bench import FakeSTT, free_port, percentile, serve
+
+
+def sample_glb(workdir: str) -> bytes:
+    """A one-triangle model, so the server's LOD builder gets a real GLB"""
+    positions = struct.pack("<9f", 0, 0, 0, 1, 0, 0, 0, 1, 0)
+    indices = struct.pack("<3H", 0, 1, 2) + b"\0\0"
+    gltf = {
+        "asset": {"version": "2.0"},
+        "buffers": [{"byteLength": len(positions) + len(indices)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(positions)},
+            {"buffer": 0, "byteOffset": len(positions), "byteLength": 6},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": 3, "type": "VEC3"},
+            {"bufferView": 1, "componentType": 5123, "count": 3, "type": "SCALAR"},
+        ],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1}]}],
+    }
+    path = os.path.join(workdir, "sample.glb")
+    write_glb(path, gltf, positions + indices)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def build_fake_meshy(args, glb_bytes: bytes) -> FastAPI:
+    """Meshy's image-to-3d create / status endpoints plus the GLB download"""
+    fake = FastAPI()
+    started = {}
+
+    @fake.post("/openapi/v1/image-to-3d")
+    async def create():
+        task_id = f"task-{len(started)}"
+        started[task_id] = time.perf_counter()
+        return {"result": task_id}
+
+    @fake.get("/openapi/v1/image-to-3d/{task_id}")
+    async def status(task_id: str):
+        if time.perf_counter() - started[task_id] < args.meshy_seconds:
+            return {"status": "IN_PROGRESS", "progress": 50, "model_urls": {}}
+        return {"status": "SUCCEEDED", "progress": 100, "model_urls": {"glb": f"{fake.state.url}/assets/{task_id}.glb"}}
+
+    @fake.get("/assets/{task_id}.glb")
+    async def glb(task_id: str):
+        return Response(glb_bytes, media_type="model/gltf-binary")
+
+    return fake
+
+
+async def submit(http: httpx.AsyncClient, image_id: str) -> tuple:
+    """(response, seconds to answer) for one generation"""
+    start = time.perf_counter()
+    r = await http.post("/generate-3d", json={"image_url": f"https://example.com/{image_id}.png", "image_id": image_id})
+    return r, time.perf_counter() - start
+
+
+async def wait_done(http: httpx.AsyncClient, job_id: str) -> str:
+    while (status := (await http.get(f"/generate-3d/{job_id}")).json()["job"]["status"]) not in ("succeeded", "failed"):
+        await asyncio.sleep(0.2)
+    return status
+
+
+async def run_bench(base_url: str, args) -> bool:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        results = await asyncio.gather(*[submit(http, f"bench-{i}") for i in range(args.requests)])
+        accepted = [(r, t) for r, t in results if r.status_code == 202]
+        rejected = [(r, t) for r, t in results if r.status_code == 429]
+        retry_after = [r.headers.get("retry-after", "") for r, _ in rejected]
+
+        print(f"{'response':<10} {'count':>5} {'p50 ms':>7} {'max ms':>7}")
+        for label, group in (("202", accepted), ("429", rejected)):
+            times = [t for _, t in group]
+            print(f"{label:<10} {len(group):>5} {percentile(times, 50) * 1000 if times else 0:7.1f} {max(times, default=0) * 1000:7.1f}")
+        print(f"Retry-After: {sorted(set(retry_after))}")
+
+        statuses = await asyncio.gather(*[wait_done(http, r.json()["job"]["job_id"]) for r, _ in accepted])
+        again, _ = await submit(http, "bench-again")
+        print(f"Accepted jobs: {statuses.count('succeeded')}/{len(statuses)} succeeded; after they finished: {again.status_code}")
+
+    return (
+        len(accepted) == min(args.requests, args.max_pending)
+        and len(accepted) + len(rejected) == args.requests
+        and all(value.isdigit() and int(value) >= 1 for value in retry_after)
+        and statuses.count("succeeded") == len(statuses)
+        and again.status_code == 202
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16, help="generations submitted at once")
+    parser.add_argument("--max-pending", type=int, default=4, help="MESHY_MAX_PENDING for the run")
+    parser.add_argument("--max-concurrency", type=int, default=2, help="MESHY_MAX_CONCURRENCY for the run")
+    parser.add_argument("--meshy-seconds", type=float, default=2.0, help="seconds the fake Meshy takes per model")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="meshy_bench_")
+    fake_port = free_port()
+    fake = build_fake_meshy(args, sample_glb(workdir))
+    fake.state.url = f"http://127.0.0.1:{fake_port}"
+    # Must be set before vic_main is imported; the admission limit is lifted so only max_pending applies
+    os.environ.update({
+        "MESHY_API_KEY": "bench",
+        "MESHY_BASE_URL": f"{fake.state.url}/openapi/v1/image-to-3d",
+        "MESHY_MAX_PENDING": str(args.max_pending),
+        "MESHY_MAX_CONCURRENCY": str(args.max_concurrency),
+        "MODEL_CACHE_DIR": os.path.join(workdir, "model_cache"),
+        "GENERATE_3D_MAX_CONCURRENCY": str(args.requests + 1),
+        "GENERATE_3D_MAX_QUEUE": str(args.requests + 1),
+        "LOG_LEVEL": "ERROR",
+    })
+    from app import vic_main
+    vic_main.MODEL_DIR = os.path.join(workdir, "models")
+    vic_main.audio_stt = lambda **kwargs: FakeSTT(0)  # no Whisper needed
+
+    print(f"🏁 {args.requests} generations at once, max pending {args.max_pending}, "
+          f"{args.max_concurrency} concurrent, fake Meshy {args.meshy_seconds}s per model\n")
+    with serve(fake, fake_port), serve(vic_main.app, free_port()) as app_url:
+        passed = asyncio.run(run_bench(app_url, args))
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import asyncio
+import base64
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
+
+from app.admission import Overloaded
+from app.metrics import observe_stage
+from app.model_cache import ModelCache
+from app.model_optimizer import ModelOptimizer
+
+logger = logging.getLogger(__name__)
+
+MESHY_API_URL = "https://api.meshy.ai/openapi/v1/image-to-3d"
+
+# Meshy task states that end a job
+MESHY_FAILED = {"FAILED", "CANCELED", "EXPIRED"}
+TERMINAL = {"succeeded", "failed"}
+
+
+class MeshyTaskFailed(Exception):
+    """Meshy reported the task as failed, cancelled or expired"""
+
+
+class MeshyJob:
+    """
+    One image-to-3D generation. `status` moves through
+    queued -> creating -> generating -> downloading -> succeeded | failed,
+    and every change wakes the SSE listeners waiting on `changed`.
+    Requests for the same image join the job via `image_ids`; the GLB is
+    served as /models/{model_id}.
+    """
+
+    def __init__(self, image_url: str, image_id: str, model_id: str, sha: str = None, phash: int = None):
+        self.job_id = uuid.uuid4().hex
+        self.image_url = image_url
+        self.image_ids = [image_id]
+        self.model_id = model_id
+        self.sha = sha
+        self.phash = phash
+        self.cached = False
+        self.status = "queued"
+        self.progress = 0
+        self.task_id = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.changed = asyncio.Event()
+
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.updated_at = time.time()
+        # Wake current listeners; later waiters get a fresh event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "image_ids": list(self.image_ids),
+            "model_id": self.model_id,
+            "status": self.status,
+            "progress": self.progress,
+            "cached": self.cached,
+            "task_id": self.task_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class MeshyJobManager:
+    """
+    Runs Meshy image-to-3D generations as background asyncio tasks.
+    All jobs share one httpx pool (separate from the chat clients), at most
+    `max_concurrency` run at once, status polls back off exponentially from
+    `poll_interval` to `max_poll_interval`, and a job that takes longer than
+    `timeout` seconds fails. The GLB is written to `model_dir/{model_id}.glb`.
+    Once `max_pending` generations are running or queued, submitting another
+    raises Overloaded instead of queueing it without bound.
+
+    With a ModelCache, images given inline (data: URLs, which is how friend
+    uploads are sent) are hashed on submit: an identical or perceptually
+    near-identical image reuses the existing GLB, and one that matches a job
+    still running joins that job instead of starting another. Remote URLs are
+    passed to Meshy untouched and never fetched by the server, and inline
+    images over `max_image_bytes` skip the cache.
+    With a ModelOptimizer, LODs of each new GLB are built in the background.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_dir: str,
+        base_url: str = MESHY_API_URL,
+        max_concurrency: int = 4,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 10.0,
+        timeout: float = 600.0,
+        max_jobs: int = 256,
+        max_pending: int = 64,
+        max_image_bytes: int = 20 * 1024 * 1024,
+        cache: ModelCache | None = None,
+        optimizer: ModelOptimizer | None = None,
+    ):
+        self.model_dir = model_dir
+        self.cache = cache
+        self.optimizer = optimizer
+        self.base_url = base_url.rstrip("/")
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.max_concurrency = max_concurrency
+        self.max_image_bytes = max_image_bytes
+
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_connections=max_concurrency * 2, max_keepalive_connections=max_concurrency),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.jobs: "OrderedDict[str, MeshyJob]" = OrderedDict()
+        self.tasks = set()
+        # Moving average of how long a generation holds its slot, for Retry-After
+        self.avg_seconds = 60.0
+
+    async def submit(self, image_url: str, image_id: str) -> MeshyJob:
+        """
+        Return a cached, in-flight or newly queued job for this image (never
+        waits for Meshy). Raises Overloaded if a new job would exceed max_pending.
+        """
+        sha = phash = None
+        if self.cache is not None:
+            image = self._inline_image(image_url)
+            if image is not None:
+                sha, phash = await asyncio.to_thread(ModelCache.fingerprint, image)
+
+        if sha is not None:
+            model_id = self.cache.lookup(sha, phash)
+            if model_id is not None:
+                await asyncio.to_thread(self.cache.alias, image_id, model_id)
+                job = MeshyJob(image_url, image_id, model_id, sha, phash)
+                job.update(status="succeeded", progress=100, cached=True)
+                self._track(job)
+                logger.info(f"🧊 3D model for '{image_id}' served from cache ({model_id})")
+                return job
+
+            for job in self.jobs.values():
+                if not job.done and (job.sha == sha or self.cache.similar(job.phash, phash)):
+                    job.image_ids.append(image_id)
+                    logger.info(f"🧊 3D generation for '{image_id}' joined job {job.job_id}")
+                    return job
+
+        if len(self.tasks) >= self.max_pending:
+            raise Overloaded("Meshy job queue", self.retry_after())
+
+        model_id = ModelCache.model_id_for(sha) if sha is not None else image_id
+        job = MeshyJob(image_url, image_id, model_id, sha, phash)
+        self._track(job)
+
+        task = asyncio.create_task(self._run(job))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    def retry_after(self) -> int:
+        """Seconds until a queued generation should have started"""
+        return max(1, math.ceil(self.avg_seconds * (len(self.tasks) + 1) / self.max_concurrency))
+
+    def get(self, job_id: str) -> Optional[MeshyJob]:
+        return self.jobs.get(job_id)
+
+    async def events(self, job: MeshyJob):
+        """Yield the job's state now and after every change, until it finishes"""
+        while True:
+            changed = job.changed
+            yield job.to_dict()
+            if job.done:
+                return
+            await changed.wait()
+
+    async def aclose(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.http.aclose()
+
+    async def _run(self, job: MeshyJob):
+        start = time.perf_counter()
+        try:
+            async with self.semaphore:
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(self._generate(job), self.timeout)
+                finally:
+                    self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.perf_counter() - started)
+            if self.cache is not None and job.sha is not None:
+                await asyncio.to_thread(self.cache.add, job.sha, job.phash, job.model_id, job.image_ids)
+                # Build the .br/.gz variants now rather than on the first download
+                asyncio.get_running_loop().run_in_executor(None, self.cache.compress, self.cache.path(job.model_id))
+            if self.optimizer is not None:
+                self.optimizer.schedule(os.path.join(self.model_dir, f"{job.model_id}.glb"))
+            job.update(status="succeeded", progress=100)
+            logger.info(f"🧊 3D model ready for {job.image_ids} ({time.perf_counter() - start:.1f}s)")
+        except asyncio.TimeoutError:
+            job.update(status="failed", error=f"Timed out after {self.timeout:.0f}s")
+            logger.warning(f"❌ 3D generation for {job.image_ids} timed out")
+        except MeshyTaskFailed as e:
+            job.update(status="failed", error=str(e))
+            logger.warning(f"❌ Meshy could not generate {job.image_ids}: {e}")
+        except asyncio.CancelledError:
+            job.update(status="failed", error="Cancelled")
+            raise
+        except Exception as e:
+            job.update(status="failed", error=str(e))
+            logger.exception(f"❌ 3D generation for {job.image_ids} failed: {e}")
+        finally:
+            observe_stage("meshy_job", time.perf_counter() - start)
+
+    async def _generate(self, job: MeshyJob):
+        # 1. Create the preview task
+        job.update(status="creating")
+        response = await self._request(
+            "POST", self.base_url, headers=self.headers,
+            json={"image_url": job.image_url, "should_texture": False},
+        )
+        job.update(status="generating", task_id=response.json()["result"])
+        logger.debug(f"Meshy task created for {job.image_ids}: {job.task_id}")
+
+        # 2. Poll until Meshy has a GLB, backing off between polls
+        delay = self.poll_interval
+        while True:
+            await asyncio.sleep(delay)
+            task = (await self._request("GET", f"{self.base_url}/{job.task_id}", headers=self.headers)).json()
+            glb_url = (task.get("model_urls") or {}).get("glb")
+            if task.get("status") in MESHY_FAILED:
+                raise MeshyTaskFailed((task.get("task_error") or {}).get("message") or f"Meshy task {task['status']}")
+            if glb_url:
+                break
+            if task.get("progress") != job.progress:
+                job.update(progress=task.get("progress") or 0)
+            delay = min(delay * 1.5, self.max_poll_interval)
+
+        # 3. Download the GLB (a signed asset URL, no API key) and write it off the event loop
+        job.update(status="downloading")
+        response = await self._request("GET", glb_url)
+        await asyncio.to_thread(self._save, job.model_id, response.content)
+
+    async def _request(self, method: str, url: str, retries: int = 4, **kwargs) -> httpx.Response:
+        """Request with exponential backoff on 429/5xx and connection errors"""
+        delay = self.poll_interval
+        for attempt in range(retries + 1):
+            try:
+                response = await self.http.request(method, url, **kwargs)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response
+                if attempt == retries:
+                    response.raise_for_status()
+                retry_after = response.headers.get("retry-after", "")
+                wait = float(retry_after) if retry_after.isdigit() else delay
+            except httpx.TransportError:
+                if attempt == retries:
+                    raise
+                wait = delay
+            await asyncio.sleep(wait + random.uniform(0, wait / 4))
+            delay = min(delay * 2, self.max_poll_interval)
+
+    def _inline_image(self, image_url: str) -> Optional[bytes]:
+        """Image bytes of a data: URL; None for remote URLs or oversized/invalid data (no dedup then)"""
+        if not image_url.startswith("data:"):
+            # Fetching arbitrary URLs from the server would be an SSRF hole; Meshy downloads them itself
+            return None
+        header, _, payload = image_url.partition(",")
+        is_base64 = header.endswith(";base64")
+        size = len(payload) * 3 // 4 if is_base64 else len(payload)
+        if size > self.max_image_bytes:
+            logger.warning(f"⚠️ Inline image is over {self.max_image_bytes // (1024 * 1024)} MB, skipping model cache")
+            return None
+        try:
+            return base64.b64decode(payload, validate=True) if is_base64 else payload.encode()
+        except ValueError as e:
+            logger.warning(f"⚠️ Could not decode inline image, skipping model cache: {e}")
+            return None
+
+    def _track(self, job: MeshyJob):
+        self.jobs[job.job_id] = job
+        self._evict()
+
+    def _save(self, model_id: str, data: bytes):
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = os.path.join(self.model_dir, f"{model_id}.glb")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        # Forget the oldest finished jobs once more than max_jobs are tracked
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if self.jobs[job_id].done:
+                del self.jobs[job_id]
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans range from sub-millisecond parsing to multi-second LLM replies
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Minimal Prometheus-style histogram (cumulative buckets, _sum, _count) with
+    labels. Thread-safe, since STT workers observe from their own threads.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # label values -> [bucket counts..., sum, count]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((key, list(series)) for key, series in self.series.items())
+        for key, series in items:
+            labels = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(labels, f'{bound:g}')} {count}")
+            lines.append(f"{self.name}_bucket{_labels(labels, '+Inf')} {series[-1]}")
+            suffix = _labels(labels)
+            lines.append(f"{self.name}_sum{suffix} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Minimal Prometheus-style counter with labels. Thread-safe."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            labels = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+            lines.append(f"{self.name}{_labels(labels)} {value:g}")
+        return lines
+
+
+def _labels(labels: list, le: str = None) -> str:
+    if le is not None:
+        labels = labels + [f'le="{le}"']
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+STAGE_SECONDS = Histogram(
+    "personifai_stage_seconds",
+    "Time spent in each stage of the request pipeline",
+    labelnames=("stage",),
+)
+REQUEST_SECONDS = Histogram(
+    "personifai_request_seconds",
+    "End-to-end HTTP request latency",
+    labelnames=("method", "route", "status"),
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "personifai_queue_wait_seconds",
+    "Time admitted requests waited for a concurrency slot",
+    labelnames=("endpoint",),
+)
+REJECTED_TOTAL = Counter(
+    "personifai_rejected_total",
+    "Requests rejected with 429 because an endpoint was at capacity",
+    labelnames=("endpoint",),
+)
+CACHE_LOOKUPS = Counter(
+    "personifai_response_cache_lookups_total",
+    "Chat response cache lookups; each hit is an LLM call saved",
+    labelnames=("cache", "result"),
+)
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, QUEUE_WAIT_SECONDS, REJECTED_TOTAL, CACHE_LOOKUPS]
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration measured by the caller"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    logger.debug("⏱️ %s took %.1f ms", stage, seconds * 1000)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one `stage` observation (recorded on errors too)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def configure_logging():
+    """
+    Set up leveled logging from LOG_LEVEL (DEBUG, INFO, WARNING, ERROR or OFF).
+    INFO logs one line per request; DEBUG adds per-step detail and span timings.
+    """
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    if level == "OFF":
+        logging.disable(logging.CRITICAL)
+        return
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if logging.getLogger().level > logging.DEBUG:
+        # httpx logs every outbound request at INFO; only show that when debugging
+        logging.getLogger("httpx").setLevel(logging.WARNING)
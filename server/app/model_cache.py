@@ -0,0 +1,314 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # perceptual matching is skipped without Pillow
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # only gzip variants without brotli
+    brotli = None
+
+INDEX_NAME = "model_index.json"
+
+# Precompressed variants, in order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+VARIANT_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+
+class ModelCache:
+    """
+    Content-addressed cache of generated GLB models in `model_dir`.
+    Each model is stored once as `{model_id}.glb`, where model_id comes from
+    the SHA-256 of the source image. A JSON index maps image hashes (exact
+    and 64-bit perceptual dHash) to models, and client image_ids to models
+    as aliases. Once the models exceed `max_bytes`, the least recently used
+    are deleted. Everything derived from the models (the index and the
+    .br/.gz variants) lives in `cache_dir`, so `model_dir` only ever holds
+    GLBs. Thread-safe.
+    """
+
+    def __init__(self, model_dir: str, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024, max_distance: int = 6):
+        self.model_dir = model_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Max Hamming distance between dHashes to count as the same image (<0 disables)
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+
+        # sha256 -> {"model_id", "phash", "size", "last_used"}
+        self.models = {}
+        # image_id -> sha256
+        self.aliases = {}
+        self.total_bytes = 0
+
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+
+        # path -> (mtime_ns, size, etag)
+        self.etags = {}
+        # path -> mtime_ns it was last compressed at (skips files that don't shrink)
+        self.compressed = {}
+        self.compressing = set()
+
+        os.makedirs(model_dir, exist_ok=True)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    # ---- hashing ----
+
+    @staticmethod
+    def fingerprint(data: bytes) -> Tuple[str, Optional[int]]:
+        """(sha256 hex, perceptual dHash or None if Pillow can't decode it)"""
+        return hashlib.sha256(data).hexdigest(), ModelCache.perceptual_hash(data)
+
+    @staticmethod
+    def perceptual_hash(data: bytes) -> Optional[int]:
+        """64-bit difference hash: survives re-encoding, resizing and small edits"""
+        if Image is None:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.draft("L", (64, 64))  # let JPEG decode at reduced size
+                pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+        except Exception:
+            return None
+        value = 0
+        for row in range(8):
+            for col in range(8):
+                value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+        return value
+
+    @staticmethod
+    def model_id_for(sha: str) -> str:
+        return sha[:16]
+
+    def similar(self, a: Optional[int], b: Optional[int]) -> bool:
+        return a is not None and b is not None and self.max_distance >= 0 and (a ^ b).bit_count() <= self.max_distance
+
+    # ---- lookups ----
+
+    def lookup(self, sha: str, phash: Optional[int]) -> Optional[str]:
+        """model_id of an identical or near-identical image already generated"""
+        with self.lock:
+            entry = self.models.get(sha)
+            if entry is not None:
+                self.exact_hits += 1
+            else:
+                entry = self._nearest(phash)
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self.perceptual_hits += 1
+            entry["last_used"] = time.time()
+            return entry["model_id"]
+
+    def resolve(self, image_id: str) -> Optional[str]:
+        """Path of the GLB for an image_id alias or model_id, if it exists"""
+        with self.lock:
+            sha = self.aliases.get(image_id)
+            entry = self.models.get(sha) if sha else None
+            if entry is not None:
+                entry["last_used"] = time.time()
+                image_id = entry["model_id"]
+        path = self.path(image_id)
+        return path if os.path.isfile(path) else None
+
+    def path(self, model_id: str) -> str:
+        return os.path.join(self.model_dir, f"{model_id}.glb")
+
+    def is_immutable(self, name: str) -> bool:
+        """True for content-addressed model_ids (their bytes never change); aliases can move"""
+        with self.lock:
+            return any(entry["model_id"] == name for entry in self.models.values())
+
+    # ---- serving ----
+
+    def etag(self, path: str) -> str:
+        """Strong ETag from the file's SHA-256 (hashed once per mtime/size)"""
+        st = os.stat(path)
+        cached = self.etags.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        self.etags[path] = (st.st_mtime_ns, st.st_size, etag)
+        return etag
+
+    def variant_path(self, path: str, encoding: str) -> str:
+        return os.path.join(self.cache_dir, os.path.basename(path) + VARIANT_SUFFIX[encoding])
+
+    def variant(self, path: str, encoding: str) -> Optional[str]:
+        """Path of an up-to-date precompressed variant, or None"""
+        variant_path = self.variant_path(path, encoding)
+        try:
+            if os.stat(variant_path).st_mtime_ns >= os.stat(path).st_mtime_ns:
+                return variant_path
+        except OSError:
+            pass
+        return None
+
+    def needs_variants(self, path: str) -> bool:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return False
+        return path not in self.compressing and self.compressed.get(path) != mtime
+
+    def compress(self, path: str):
+        """Write missing .br/.gz variants of `path` to cache_dir (slow; run in a worker thread)"""
+        with self.lock:
+            if path in self.compressing:
+                return
+            self.compressing.add(path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            data = None
+            for encoding in ENCODINGS:
+                if self.variant(path, encoding) is not None:
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                if encoding == "br":
+                    packed = brotli.compress(data, mode=brotli.MODE_GENERIC, quality=9)
+                else:
+                    packed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(packed) >= len(data):
+                    continue  # not worth serving
+                variant_path = self.variant_path(path, encoding)
+                tmp_path = f"{variant_path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(packed)
+                os.replace(tmp_path, variant_path)
+            self.compressed[path] = mtime
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                self.compressing.discard(path)
+
+    # ---- updates ----
+
+    def add(self, sha: str, phash: Optional[int], model_id: str, image_ids=()):
+        """Register a freshly downloaded `{model_id}.glb` and evict if over budget"""
+        size = os.path.getsize(self.path(model_id))
+        with self.lock:
+            old = self.models.pop(sha, None)
+            if old is not None:
+                self.total_bytes -= old["size"]
+            self.models[sha] = {"model_id": model_id, "phash": phash, "size": size, "last_used": time.time()}
+            self.total_bytes += size
+            for image_id in image_ids:
+                self.aliases[image_id] = sha
+            self._evict(keep=sha)
+            self._save_index()
+
+    def alias(self, image_id: str, model_id: str):
+        """Point a client image_id at an existing model"""
+        with self.lock:
+            for sha, entry in self.models.items():
+                if entry["model_id"] == model_id:
+                    self.aliases[image_id] = sha
+                    self._save_index()
+                    return
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.exact_hits + self.perceptual_hits + self.misses
+            return {
+                "models": len(self.models),
+                "aliases": len(self.aliases),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "exact_hits": self.exact_hits,
+                "perceptual_hits": self.perceptual_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.perceptual_hits) / lookups, 4) if lookups else 0.0,
+                "perceptual": Image is not None and self.max_distance >= 0,
+            }
+
+    # ---- internals (caller holds the lock) ----
+
+    def _nearest(self, phash: Optional[int]) -> Optional[dict]:
+        best, best_distance = None, None
+        for entry in self.models.values():
+            if self.similar(phash, entry["phash"]):
+                distance = (phash ^ entry["phash"]).bit_count()
+                if best is None or distance < best_distance:
+                    best, best_distance = entry, distance
+        return best
+
+    def _evict(self, keep: str):
+        for sha, entry in sorted(self.models.items(), key=lambda item: item[1]["last_used"]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if sha == keep:
+                continue
+            del self.models[sha]
+            self.total_bytes -= entry["size"]
+            self.aliases = {image_id: s for image_id, s in self.aliases.items() if s != sha}
+            # The GLB plus its LODs ({model_id}.low.glb, ...) and .br/.gz variants
+            prefix = entry["model_id"] + "."
+            for directory in (self.model_dir, self.cache_dir):
+                for name in os.listdir(directory):
+                    if name.startswith(prefix):
+                        try:
+                            os.remove(os.path.join(directory, name))
+                        except OSError:
+                            pass
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_NAME)
+        tmp_path = f"{index_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"models": self.models, "aliases": self.aliases}, f)
+        os.replace(tmp_path, index_path)
+
+    def _load_index(self):
+        index = None
+        # Older versions kept the index next to the models
+        for directory in (self.cache_dir, self.model_dir):
+            try:
+                with open(os.path.join(directory, INDEX_NAME)) as f:
+                    index = json.load(f)
+                break
+            except (OSError, ValueError):
+                continue
+        if index is None:
+            return
+        for sha, entry in index.get("models", {}).items():
+            # Drop entries whose GLB was deleted behind our back
+            if os.path.isfile(self.path(entry["model_id"])):
+                self.models[sha] = entry
+                self.total_bytes += entry["size"]
+        self.aliases = {image_id: sha for image_id, sha in index.get("aliases", {}).items() if sha in self.models}
+
+
+def accepted_encodings(header: Optional[str]) -> set:
+    """Content codings from an Accept-Encoding header (q=0 excluded)"""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
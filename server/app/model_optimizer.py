@@ -0,0 +1,468 @@
+import asyncio
+import copy
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import struct
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # textures are left as-is without Pillow
+    Image = None
+
+from app.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Triangle budget and max texture edge per level of detail
+LODS = {
+    "high": {"triangles": 100_000, "texture_size": 2048},
+    "low": {"triangles": 15_000, "texture_size": 512},
+}
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+COMPONENT_TYPES = {5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+TYPE_WIDTHS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4}
+# Vertex attributes the built-in simplifier can merge by averaging
+MERGEABLE = {"POSITION", "NORMAL", "COLOR_0"}
+# Extensions that store geometry outside plain accessors; such files are left to gltfpack
+GEOMETRY_EXTENSIONS = {"KHR_draco_mesh_compression", "EXT_meshopt_compression", "EXT_mesh_gpu_instancing"}
+
+
+# ==================== GLB helpers (run in the worker processes) ====================
+
+def read_glb(path: str):
+    """(gltf json, binary chunk) of a .glb file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, _, length = struct.unpack_from("<4sII", data, 0)
+    if magic != GLB_MAGIC:
+        raise ValueError(f"{path} is not a GLB file")
+    gltf, binary = None, b""
+    offset = 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(chunk)
+        elif chunk_type == CHUNK_BIN:
+            binary = chunk
+        offset += 8 + chunk_length
+    return gltf, binary
+
+
+def write_glb(path: str, gltf: dict, binary: bytes):
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\x00" * (-len(binary) % 4)
+    length = 12 + 8 + len(json_chunk) + (8 + len(binary) if binary else 0)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", GLB_MAGIC, 2, length))
+        f.write(struct.pack("<II", len(json_chunk), CHUNK_JSON) + json_chunk)
+        if binary:
+            f.write(struct.pack("<II", len(binary), CHUNK_BIN) + binary)
+
+
+def count_triangles(gltf: dict) -> int:
+    total = 0
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            if primitive.get("mode", 4) != 4:  # TRIANGLES only
+                continue
+            accessor = primitive["indices"] if "indices" in primitive else primitive["attributes"]["POSITION"]
+            total += gltf["accessors"][accessor]["count"] // 3
+    return total
+
+
+def downscale_textures(gltf: dict, binary: bytes, max_size: int) -> bytes:
+    """Shrink embedded images to `max_size` px; rewrites bufferViews in `gltf` and returns the new binary"""
+    if Image is None:
+        return binary
+    views = gltf.get("bufferViews", [])
+    replacements = {}
+    for image in gltf.get("images", []):
+        if "bufferView" not in image:
+            continue
+        view = views[image["bufferView"]]
+        start = view.get("byteOffset", 0)
+        with Image.open(io.BytesIO(binary[start:start + view["byteLength"]])) as img:
+            if max(img.size) <= max_size:
+                continue
+            img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+            out = io.BytesIO()
+            if image.get("mimeType") == "image/png":
+                img.save(out, "PNG", optimize=True)
+            else:
+                img.convert("RGB").save(out, "JPEG", quality=85, optimize=True)
+        replacements[image["bufferView"]] = out.getvalue()
+
+    if not replacements:
+        return binary
+
+    # Repack buffer 0 in the original order with the smaller images
+    packed = bytearray()
+    for index, view in sorted(enumerate(views), key=lambda item: item[1].get("byteOffset", 0)):
+        if view.get("buffer", 0) != 0:
+            continue
+        start = view.get("byteOffset", 0)
+        data = replacements.get(index, binary[start:start + view["byteLength"]])
+        packed += b"\x00" * (-len(packed) % 4)
+        view["byteOffset"] = len(packed)
+        view["byteLength"] = len(data)
+        packed += data
+    gltf["buffers"][0]["byteLength"] = len(packed)
+    return bytes(packed)
+
+
+def read_accessor(gltf: dict, binary: bytes, index: int) -> Optional[np.ndarray]:
+    """Accessor data as a (count, width) array; None for layouts it doesn't handle (sparse, normalized, other buffers)"""
+    accessor = gltf["accessors"][index]
+    if "bufferView" not in accessor or "sparse" in accessor or accessor.get("normalized"):
+        return None
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    if view.get("buffer", 0) != 0:
+        return None
+    dtype = np.dtype(COMPONENT_TYPES[accessor["componentType"]])
+    width = TYPE_WIDTHS.get(accessor["type"])
+    if width is None:
+        return None
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride") or dtype.itemsize * width
+    data = np.ndarray((accessor["count"], width), dtype, buffer=binary, offset=offset, strides=(stride, dtype.itemsize))
+    return data.copy()
+
+
+def _uses_textures(material) -> bool:
+    if isinstance(material, dict):
+        return any(key.endswith("Texture") or _uses_textures(value) for key, value in material.items())
+    return False
+
+
+def cluster_vertices(positions: np.ndarray, triangles: np.ndarray, grid: int):
+    """
+    Vertex clustering: snap vertices to a `grid`^3 lattice over the bounding
+    box and merge each cell into one vertex. Returns (cluster of every vertex,
+    surviving triangles as cluster ids) with collapsed and duplicate triangles removed.
+    """
+    low = positions.min(axis=0)
+    extent = float((positions.max(axis=0) - low).max()) or 1.0
+    cells = np.minimum(((positions - low) * (grid / extent)).astype(np.int64), grid - 1)
+    keys = (cells[:, 0] * grid + cells[:, 1]) * grid + cells[:, 2]
+    _, cluster = np.unique(keys, return_inverse=True)
+    merged = cluster.reshape(-1)[triangles]
+    keep = (merged[:, 0] != merged[:, 1]) & (merged[:, 1] != merged[:, 2]) & (merged[:, 0] != merged[:, 2])
+    merged = merged[keep]
+    _, first = np.unique(np.sort(merged, axis=1), axis=0, return_index=True)
+    return cluster.reshape(-1), merged[np.sort(first)]
+
+
+def simplify_primitive(attributes: dict, triangles: np.ndarray, target: int):
+    """
+    Reduce one primitive to at most `target` triangles (as close as the grid
+    allows) by vertex clustering, picking the finest grid that fits the
+    budget. Merged vertices get the mean of their attributes; normals are
+    renormalized. Returns (attributes, triangles) or None if already in budget.
+    """
+    if len(triangles) <= target:
+        return None
+    positions = attributes["POSITION"]
+    low, high = 2, 1024
+    best = cluster_vertices(positions, triangles, low)
+    while low < high:
+        grid = (low + high + 1) // 2
+        cluster, merged = cluster_vertices(positions, triangles, grid)
+        if len(merged) <= target:
+            low, best = grid, (cluster, merged)
+        else:
+            high = grid - 1
+    cluster, merged = best
+
+    # Keep only clusters some triangle still uses, numbered in order
+    used, merged = np.unique(merged, return_inverse=True)
+    merged = merged.reshape(-1, 3).astype(np.uint32)
+    remap = np.full(cluster.max() + 1, -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    vertex_cluster = remap[cluster]
+    alive = vertex_cluster >= 0
+    counts = np.bincount(vertex_cluster[alive], minlength=len(used)).astype(np.float64)
+
+    reduced = {}
+    for name, values in attributes.items():
+        columns = [
+            np.bincount(vertex_cluster[alive], weights=values[alive, column], minlength=len(used)) / counts
+            for column in range(values.shape[1])
+        ]
+        mean = np.stack(columns, axis=1).astype(np.float32)
+        if name == "NORMAL":
+            lengths = np.linalg.norm(mean, axis=1, keepdims=True)
+            mean = np.divide(mean, lengths, out=np.zeros_like(mean), where=lengths > 0)
+        reduced[name] = mean
+    return reduced, merged
+
+
+def simplify_meshes(gltf: dict, binary: bytes, max_triangles: int) -> bytes:
+    """
+    Built-in geometry step for when gltfpack isn't installed: simplify every
+    untextured triangle primitive so the model fits `max_triangles` (split in
+    proportion to each primitive's share). Textured, skinned and morphed
+    primitives are left alone, since averaging UVs or weights breaks them.
+    Rewrites `gltf` and returns the new binary (the same object if nothing changed).
+    """
+    total = count_triangles(gltf)
+    if total <= max_triangles or GEOMETRY_EXTENSIONS & set(gltf.get("extensionsUsed", [])):
+        return binary
+    materials = gltf.get("materials", [])
+    new_views = {}
+
+    def add_accessor(values: np.ndarray, accessor_type: str, component_type: int, buffer_target: int, bounds: bool = False) -> int:
+        data = values.tobytes()
+        new_views[len(gltf["bufferViews"])] = data
+        gltf["bufferViews"].append({"buffer": 0, "byteLength": len(data), "target": buffer_target})
+        accessor = {"bufferView": len(gltf["bufferViews"]) - 1, "componentType": component_type,
+                    "count": len(values), "type": accessor_type}
+        if bounds:
+            accessor["min"] = values.min(axis=0).tolist()
+            accessor["max"] = values.max(axis=0).tolist()
+        gltf["accessors"].append(accessor)
+        return len(gltf["accessors"]) - 1
+
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            if primitive.get("mode", 4) != 4 or "targets" in primitive:
+                continue
+            material = materials[primitive["material"]] if "material" in primitive else {}
+            names = set(primitive["attributes"])
+            if _uses_textures(material) or not names - {"TEXCOORD_0", "TEXCOORD_1"} <= MERGEABLE:
+                continue
+            attributes = {}
+            for name in names & MERGEABLE:
+                values = read_accessor(gltf, binary, primitive["attributes"][name])
+                if values is None or values.dtype != np.float32:
+                    break
+                attributes[name] = values
+            else:
+                if "POSITION" not in attributes:
+                    continue
+                vertices = len(attributes["POSITION"])
+                if "indices" in primitive:
+                    indices = read_accessor(gltf, binary, primitive["indices"])
+                    if indices is None:
+                        continue
+                    triangles = indices.reshape(-1)[:len(indices) // 3 * 3].reshape(-1, 3).astype(np.int64)
+                else:
+                    triangles = np.arange(vertices // 3 * 3, dtype=np.int64).reshape(-1, 3)
+                budget = max(1, max_triangles * len(triangles) // total)
+                result = simplify_primitive(attributes, triangles, budget)
+                if result is None:
+                    continue
+                reduced, merged = result
+
+                # Untextured, so UVs are dead weight and can't be averaged anyway
+                primitive["attributes"] = {
+                    name: add_accessor(values, "VEC3" if values.shape[1] == 3 else "VEC4", 5126, 34962,
+                                       bounds=name == "POSITION")
+                    for name, values in reduced.items()
+                }
+                small = len(reduced["POSITION"]) <= 0xFFFF
+                indices = merged.astype(np.uint16 if small else np.uint32).reshape(-1, 1)
+                primitive["indices"] = add_accessor(indices, "SCALAR", 5123 if small else 5125, 34963)
+
+    if not new_views:
+        return binary
+    return _repack(gltf, binary, new_views)
+
+
+def _repack(gltf: dict, binary: bytes, new_views: dict) -> bytes:
+    """Drop accessors and bufferViews nothing references any more and rebuild buffer 0"""
+    used_accessors = set()
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            used_accessors.update(primitive["attributes"].values())
+            if "indices" in primitive:
+                used_accessors.add(primitive["indices"])
+            for target in primitive.get("targets", []):
+                used_accessors.update(target.values())
+    for skin in gltf.get("skins", []):
+        if "inverseBindMatrices" in skin:
+            used_accessors.add(skin["inverseBindMatrices"])
+    for animation in gltf.get("animations", []):
+        for sampler in animation.get("samplers", []):
+            used_accessors.update((sampler["input"], sampler["output"]))
+
+    accessor_map = {old: new for new, old in enumerate(sorted(used_accessors))}
+    gltf["accessors"] = [gltf["accessors"][old] for old in sorted(used_accessors)]
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            primitive["attributes"] = {name: accessor_map[index] for name, index in primitive["attributes"].items()}
+            if "indices" in primitive:
+                primitive["indices"] = accessor_map[primitive["indices"]]
+            if "targets" in primitive:
+                primitive["targets"] = [{name: accessor_map[index] for name, index in target.items()}
+                                        for target in primitive["targets"]]
+    for skin in gltf.get("skins", []):
+        if "inverseBindMatrices" in skin:
+            skin["inverseBindMatrices"] = accessor_map[skin["inverseBindMatrices"]]
+    for animation in gltf.get("animations", []):
+        for sampler in animation.get("samplers", []):
+            sampler["input"] = accessor_map[sampler["input"]]
+            sampler["output"] = accessor_map[sampler["output"]]
+
+    view_refs = [accessor for accessor in gltf["accessors"] if "bufferView" in accessor]
+    view_refs += [image for image in gltf.get("images", []) if "bufferView" in image]
+    for accessor in gltf["accessors"]:
+        sparse = accessor.get("sparse")
+        if sparse:
+            view_refs += [sparse["indices"], sparse["values"]]
+    used_views = sorted({ref["bufferView"] for ref in view_refs})
+
+    packed = bytearray()
+    views = []
+    for old in used_views:
+        view = gltf["bufferViews"][old]
+        if view.get("buffer", 0) == 0:
+            start = view.get("byteOffset", 0)
+            data = new_views.get(old, binary[start:start + view["byteLength"]])
+            packed += b"\x00" * (-len(packed) % 4)
+            view["byteOffset"] = len(packed)
+            view["byteLength"] = len(data)
+            packed += data
+        views.append(view)
+    view_map = {old: new for new, old in enumerate(used_views)}
+    for ref in view_refs:
+        ref["bufferView"] = view_map[ref["bufferView"]]
+    gltf["bufferViews"] = views
+    gltf["buffers"][0]["byteLength"] = len(packed)
+    return bytes(packed)
+
+
+def build_lods(path: str, out_dir: str, gltfpack: Optional[str], meshopt: bool, lods: dict = LODS) -> dict:
+    """
+    Write `{out_dir}/{stem}.{lod}.glb` for every LOD: textures downscaled,
+    then simplified to the triangle budget. With gltfpack the geometry is
+    simplified, quantized and, if `meshopt`, meshopt-compressed; without it
+    the built-in simplifier (simplify_meshes) is used. LODs that would be
+    identical to the source are skipped.
+    """
+    start = time.perf_counter()
+    gltf, binary = read_glb(path)
+    triangles = count_triangles(gltf)
+    stem = os.path.join(out_dir, os.path.basename(path)[:-len(".glb")])
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+
+    for lod, budget in lods.items():
+        out_path = f"{stem}.{lod}.glb"
+        tmp_path = f"{stem}.{lod}.{os.getpid()}.tmp.glb"
+        packed_path = f"{stem}.{lod}.{os.getpid()}.packed.glb"
+        try:
+            lod_gltf = copy.deepcopy(gltf)
+            lod_binary = downscale_textures(lod_gltf, binary, budget["texture_size"])
+            if gltfpack is None:
+                lod_binary = simplify_meshes(lod_gltf, lod_binary, budget["triangles"])
+                if lod_binary is binary:
+                    continue
+            write_glb(tmp_path, lod_gltf, lod_binary)
+
+            if gltfpack is not None:
+                ratio = min(1.0, budget["triangles"] / triangles) if triangles else 1.0
+                command = [gltfpack, "-i", tmp_path, "-o", packed_path, "-si", f"{ratio:.4f}"]
+                if meshopt:
+                    command.append("-cc")
+                subprocess.run(command, check=True, capture_output=True, timeout=300)
+                os.replace(packed_path, tmp_path)
+
+            os.replace(tmp_path, out_path)
+            results[lod] = os.path.getsize(out_path)
+        finally:
+            for leftover in (tmp_path, packed_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+    return {"triangles": triangles, "lods": results, "seconds": time.perf_counter() - start}
+
+
+# ==================== Async front end (API process) ====================
+
+class ModelOptimizer:
+    """
+    Post-processes GLBs into low/high LOD variants in `cache_dir` using a
+    process pool, so mesh and texture work never runs on the API's event
+    loop. Geometry is reduced by the `gltfpack` binary (meshoptimizer) when
+    installed, which also quantizes and compresses; otherwise by the built-in
+    NumPy simplifier. Requests for a LOD that isn't built yet get the
+    original, and so do LODs that turned out identical to it.
+    """
+
+    def __init__(self, cache_dir: str, max_workers: int = 1, gltfpack: Optional[str] = None, meshopt: bool = True):
+        self.cache_dir = cache_dir
+        self.gltfpack = gltfpack or shutil.which("gltfpack")
+        self.meshopt = meshopt
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        # path -> source mtime_ns that was (or is being) optimized
+        self.scheduled = {}
+        # path -> (source mtime_ns, LODs written); LODs left out match the source
+        self.built = {}
+
+    def lod_path(self, path: str, lod: str) -> str:
+        return os.path.join(self.cache_dir, f"{os.path.basename(path)[:-len('.glb')]}.{lod}.glb")
+
+    def get(self, path: str, lod: str) -> Optional[str]:
+        """Path of an up-to-date LOD of `path` (possibly `path` itself), or None"""
+        lod_path = self.lod_path(path, lod)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        try:
+            if os.stat(lod_path).st_mtime_ns >= mtime:
+                return lod_path
+        except OSError:
+            pass
+        built = self.built.get(path)
+        if built is not None and built[0] == mtime and lod not in built[1]:
+            return path
+        return None
+
+    def schedule(self, path: str):
+        """Build LODs for `path` in the background unless already done for this version"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        if self.scheduled.get(path) == mtime:
+            return
+        self.scheduled[path] = mtime
+
+        future = asyncio.get_running_loop().run_in_executor(
+            self.pool, build_lods, path, self.cache_dir, self.gltfpack, self.meshopt
+        )
+        future.add_done_callback(lambda f: self._done(path, mtime, f))
+
+    def _done(self, path: str, mtime: int, future: asyncio.Future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"❌ GLB optimization failed for {os.path.basename(path)}: {future.exception()}")
+            return
+        result = future.result()
+        self.built[path] = (mtime, set(result["lods"]))
+        observe_stage("model_optimize", result["seconds"])
+        logger.info(
+            f"🧊 Optimized {os.path.basename(path)} ({result['triangles']} triangles): "
+            f"{result['lods'] or 'nothing to reduce'} in {result['seconds']:.1f}s"
+        )
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+"""
+StreamParser micro-benchmark: long streamed replies split into many tiny chunks.
+
+Usage (from server/):
+    python -m app.parser_bench [--repeat 5]
+
+Compares the incremental scanner in llm_parser against the previous
+regex/buffer implementation (kept below as LegacyStreamParser), and checks
+that both agree with CMD_RE on the full text.
+"""
+import argparse
+import random
+import time
+
+from app.llm_parser import CMD_RE, StreamParser
+
+REPLY_LENGTHS = [2_000, 20_000, 200_000]
+WORDS = "you are a very happy lamp and you love to light up the whole room for everyone".split()
+ACTIONS = ["JUMP", "WAVE", "WOBBLE", "SPIN", "GLOW"]
+
+
+class LegacyStreamParser:
+    """The regex + string-buffer parser StreamParser replaced"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.clean_text = ""
+        self.commands = []
+
+    def parse_chunk(self, chunk: str):
+        self.buffer += chunk
+        new_clean = ""
+        commands_found = []
+        while True:
+            m = CMD_RE.search(self.buffer)
+            if not m:
+                break
+            start, end = m.span()
+            text_segment = self.buffer[:start]
+            new_clean += text_segment
+            self.clean_text += text_segment
+            self.commands.append(m.group(1))
+            commands_found.append(m.group(1))
+            self.buffer = self.buffer[end:]
+        if not commands_found:
+            last_bracket = self.buffer.rfind("[[")
+            if last_bracket == -1 and self.buffer.endswith("["):
+                last_bracket = len(self.buffer) - 1
+            if last_bracket == -1:
+                new_clean += self.buffer
+                self.clean_text += self.buffer
+                self.buffer = ""
+            else:
+                flush = self.buffer[:last_bracket]
+                new_clean += flush
+                self.clean_text += flush
+                self.buffer = self.buffer[last_bracket:]
+        return new_clean, commands_found
+
+    def finalize(self):
+        self.clean_text += self.buffer
+        self.buffer = ""
+        return {"clean_text": self.clean_text, "commands": self.commands, "is_end": True}
+
+
+def make_reply(length: int, rng: random.Random) -> str:
+    """Prose with an [[ACTION]] marker roughly every 150 characters"""
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        if rng.random() < 0.03:
+            word = f"[[{rng.choice(ACTIONS)}]]"
+        elif rng.random() < 0.05:
+            word += rng.choice([".", "!", "?", ","])
+        parts.append(word)
+        size += len(word) + 1
+    return " ".join(parts)
+
+
+def make_chunks(text: str, rng: random.Random) -> list:
+    """Split like a token stream: 1-4 characters per chunk"""
+    chunks = []
+    i = 0
+    while i < len(text):
+        step = rng.randint(1, 4)
+        chunks.append(text[i:i + step])
+        i += step
+    return chunks
+
+
+def run(parser, chunks: list) -> tuple:
+    text = []
+    commands = []
+    for chunk in chunks:
+        clean, cmds = parser.parse_chunk(chunk)
+        text.append(clean)
+        commands.extend(cmds)
+    final = parser.finalize()
+    text.append(final.get("tail", ""))
+    return "".join(text), commands
+
+
+def best_of(repeat: int, make_parser, chunks: list) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        parser = make_parser()
+        start = time.perf_counter()
+        run(parser, chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'reply chars':>12} {'chunks':>8} {'legacy ms':>10} {'scanner ms':>11} {'no-history ms':>14} {'speedup':>8}")
+    for length in REPLY_LENGTHS:
+        text = make_reply(length, rng)
+        chunks = make_chunks(text, rng)
+
+        # Correctness: both parsers must agree with CMD_RE on the whole reply
+        expected = (CMD_RE.sub("", text), CMD_RE.findall(text))
+        assert run(StreamParser(), chunks) == expected, "scanner output differs from CMD_RE"
+        assert run(StreamParser(keep_history=False), chunks) == expected, "no-history output differs"
+        legacy_text, legacy_cmds = run(LegacyStreamParser(), chunks)
+        assert legacy_cmds == expected[1]
+
+        legacy = best_of(args.repeat, LegacyStreamParser, chunks)
+        scanner = best_of(args.repeat, StreamParser, chunks)
+        no_history = best_of(args.repeat, lambda: StreamParser(keep_history=False), chunks)
+        print(f"{len(text):>12} {len(chunks):>8} {legacy * 1000:>10.2f} {scanner * 1000:>11.2f} "
+              f"{no_history * 1000:>14.2f} {legacy / scanner:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
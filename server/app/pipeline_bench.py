@@ -0,0 +1,512 @@
+"""
+Chat pipeline benchmark: vic_main's app against local stand-ins for
+Backboard, Gemini and ElevenLabs.
+
+Usage (from server/):
+    python -m app.pipeline_bench [--concurrency 1 4 16] [--requests 32]
+                                 [--token-rate 50] [--tts-latency 0.3] ...
+
+A fake Backboard + ElevenLabs HTTP service runs on a local port and the real
+SDK clients are pointed at it (BACKBOARD_BASE_URL / ELEVENLABS_BASE_URL), so
+connection pooling, SSE parsing and TTS fan-out are all exercised. Gemini's
+async client speaks gRPC, so image analysis is replaced in-process by a
+coroutine with the same latency knob. Whisper is replaced by a fixed-latency
+stand-in unless --real-stt is given (use stt_bench.py for Whisper itself).
+
+For every endpoint and concurrency level it reports requests/sec and
+p50/p95/p99 of end-to-end latency, time-to-first-text and time-to-first-audio.
+JSON endpoints deliver text with the response, and their first audio is the
+follow-up GET of `audio_url`; /send-message/stream reports both as they arrive.
+
+It then sends one probe message whose reply opens with a short sentence and
+runs on for a few hundred characters, and fails (exit 1) unless that
+sentence's TTS call started before PROBE_LIMIT characters had streamed,
+or unless /create-friend refuses an upload OVERSIZE_FACTOR times over
+UPLOAD_MAX_MB without the app reading all of it (with and without a
+declared Content-Length).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from datetime import datetime, timezone
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+ENDPOINTS = ["/create-friend", "/send-message", "/send-message/stream", "/send-voice-message"]
+WORDS = "you are a very happy lamp and you love to light up the whole room for everyone".split()
+ACTIONS = ["JUMP", "WAVE", "WOBBLE", "SPIN"]
+# The first sentence must reach TTS before this many reply characters stream
+# (the default text batch size, so batching can't hold speech back)
+PROBE_LIMIT = 250
+PROBE_REPLY = "Hi there, I am your friendly lamp! " + " ".join(WORDS * 6) + "."
+OVERSIZE_FACTOR = 4
+
+
+# ==================== Fake services ====================
+
+def make_reply(chars: int, rng: random.Random) -> str:
+    """Random prose with sentence breaks and [[ACTION]] markers (random so TTS cache never hits)"""
+    parts = []
+    size = 0
+    while size < chars:
+        word = rng.choice(WORDS)
+        if rng.random() < 0.04:
+            word = f"[[{rng.choice(ACTIONS)}]]"
+        elif rng.random() < 0.1:
+            word += rng.choice([".", "!", "?"])
+        parts.append(word)
+        size += len(word) + 1
+    return " ".join(parts) + "."
+
+
+def build_fake_services(args) -> FastAPI:
+    """Backboard (assistants, threads, streamed messages) and ElevenLabs TTS on one app"""
+    fake = FastAPI()
+    rng = random.Random(args.seed)
+    # Probe bookkeeping: reply characters streamed, and how many had been when TTS was first called
+    fake.state.next_reply = None
+    fake.state.streamed = 0
+    fake.state.first_tts_streamed = None
+
+    def now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    @fake.post("/api/assistants")
+    async def create_assistant(request: Request):
+        body = await request.json()
+        await asyncio.sleep(args.backboard_latency)
+        return {"assistant_id": str(uuid.uuid4()), "name": body["name"], "description": body.get("description"), "created_at": now()}
+
+    @fake.post("/api/assistants/{assistant_id}/threads")
+    async def create_thread(assistant_id: str):
+        await asyncio.sleep(args.backboard_latency)
+        return {"thread_id": str(uuid.uuid4()), "created_at": now()}
+
+    @fake.post("/api/threads/messages")
+    async def add_message(request: Request):
+        await request.form()
+        reply = fake.state.next_reply or make_reply(args.reply_chars, rng)
+        fake.state.next_reply = None
+
+        async def stream():
+            await asyncio.sleep(args.backboard_latency)  # time to first token
+            for i in range(0, len(reply), args.chars_per_token):
+                chunk = {"type": "content_streaming", "content": reply[i:i + args.chars_per_token]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                fake.state.streamed += len(chunk["content"])
+                await asyncio.sleep(1 / args.token_rate)
+            yield f"data: {json.dumps({'type': 'message_complete'})}\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @fake.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        text = (await request.json())["text"]
+        if fake.state.first_tts_streamed is None:
+            fake.state.first_tts_streamed = fake.state.streamed
+        await asyncio.sleep(args.tts_latency + len(text) * args.tts_per_char)
+        # ~1 KB of "MP3" per 10 characters, roughly a 128 kbps clip
+        return Response(b"\xff\xfb" * (len(text) * 50), media_type="audio/mpeg")
+
+    return fake
+
+
+async def fake_analyze_image(image_path: str, latency: float) -> dict:
+    """Stands in for image_analyzer.analyze_image_for_assistant (one Gemini call)"""
+    await asyncio.sleep(latency)
+    return {"name": "Lamp", "description": "You are a small desk lamp with a warm glow. "}
+
+
+class FakeSTT:
+    """Stands in for the Whisper pool: fixed latency per clip, fixed transcript"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def transcribe(self, audio, timeout=None, sampling_rate=16000) -> str:
+        await asyncio.sleep(self.latency)
+        return "Hello there, how are you doing today?"
+
+    def stats(self) -> dict:
+        return {}
+
+    def stop(self):
+        pass
+
+
+def silent_wav(seconds: float = 1.0) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\x00\x00" * int(16000 * seconds))
+    return buf.getvalue()
+
+
+def sample_jpeg(size=(1600, 1200)) -> bytes:
+    """A phone-sized photo stand-in, so /create-friend has something to normalize"""
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+# ==================== Servers ====================
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve(app, port: int):
+    """Run an ASGI app with uvicorn on a background thread"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"server on port {port} failed to start")
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def count_body_bytes(app, counts: dict):
+    """Wrap an ASGI app to total, per path, the request body bytes it reads"""
+    async def counted(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                counts[scope["path"]] = counts.get(scope["path"], 0) + len(message.get("body", b""))
+            return message
+
+        await app(scope, counting_receive, send)
+    return counted
+
+
+# ==================== Load generation ====================
+
+class Sample:
+    __slots__ = ("ok", "latency", "first_text", "first_audio")
+
+    def __init__(self, ok, latency, first_text=None, first_audio=None):
+        self.ok = ok
+        self.latency = latency
+        self.first_text = first_text
+        self.first_audio = first_audio
+
+
+async def fetch_audio(http: httpx.AsyncClient, body: dict, start: float):
+    """Time at which the reply audio has been fetched (JSON endpoints)"""
+    if not body.get("audio_url"):
+        return None
+    r = await http.get(body["audio_url"])
+    return time.perf_counter() - start if r.status_code == 200 else None
+
+
+async def call_create_friend(http, ctx, i):
+    start = time.perf_counter()
+    r = await http.post(
+        "/create-friend",
+        files={"image": ("bench.jpeg", ctx["image"], "image/jpeg")},
+        data={"name": "Lamp", "personality": "", "image_id": f"bench-new-{uuid.uuid4().hex}"},
+    )
+    latency = time.perf_counter() - start
+    ok = r.status_code == 200 and r.json().get("success")
+    return Sample(ok, latency, latency)
+
+
+async def call_send_message(http, ctx, i):
+    start = time.perf_counter()
+    r = await http.post("/send-message", json={"friend_id": ctx["friends"][i], "message": "Tell me about yourself"})
+    latency = time.perf_counter() - start
+    body = r.json()
+    if r.status_code != 200 or not body.get("success"):
+        return Sample(False, latency)
+    return Sample(True, latency, latency, await fetch_audio(http, body, start))
+
+
+async def call_send_message_stream(http, ctx, i):
+    start = time.perf_counter()
+    first_text = first_audio = None
+    ok = False
+    event = None
+    async with http.stream("POST", "/send-message/stream", json={"friend_id": ctx["friends"][i], "message": "Tell me about yourself"}) as r:
+        async for line in r.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                elapsed = time.perf_counter() - start
+                if event == "text" and first_text is None and json.loads(line[len("data: "):])["clean_text"].strip():
+                    first_text = elapsed
+                elif event == "audio" and first_audio is None:
+                    first_audio = elapsed
+                elif event == "done":
+                    ok = True
+                elif event == "error":
+                    break
+    return Sample(ok, time.perf_counter() - start, first_text, first_audio)
+
+
+async def call_send_voice_message(http, ctx, i):
+    start = time.perf_counter()
+    r = await http.post(
+        "/send-voice-message",
+        files={"audio": ("bench.wav", ctx["audio"], "audio/wav")},
+        data={"friend_id": ctx["friends"][i]},
+    )
+    latency = time.perf_counter() - start
+    body = r.json()
+    if r.status_code != 200 or not body.get("success"):
+        return Sample(False, latency)
+    return Sample(True, latency, latency, await fetch_audio(http, body, start))
+
+
+CALLS = {
+    "/create-friend": call_create_friend,
+    "/send-message": call_send_message,
+    "/send-message/stream": call_send_message_stream,
+    "/send-voice-message": call_send_voice_message,
+}
+
+
+async def run_level(http, ctx, endpoint: str, concurrency: int, requests: int):
+    """`concurrency` clients share `requests` calls; returns (samples, elapsed)"""
+    call = CALLS[endpoint]
+    remaining = iter(range(requests))
+    samples = []
+
+    async def client(i):
+        for _ in remaining:
+            try:
+                samples.append(await call(http, ctx, i))
+            except httpx.HTTPError:
+                samples.append(Sample(False, 0.0))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(concurrency)])
+    return samples, time.perf_counter() - start
+
+
+def percentile(values: list, p: float):
+    """Nearest-rank percentile; None for no data"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def ms(value) -> str:
+    return f"{value * 1000:7.0f}" if value is not None else "      -"
+
+
+def summarize(endpoint: str, concurrency: int, samples: list, elapsed: float) -> str:
+    ok = [s for s in samples if s.ok]
+    latency = [s.latency for s in ok]
+    first_text = [s.first_text for s in ok if s.first_text is not None]
+    first_audio = [s.first_audio for s in ok if s.first_audio is not None]
+    return (
+        f"{endpoint:<21} {concurrency:>4} {len(ok):>4}/{len(samples):<4} {len(ok) / elapsed:7.2f} "
+        f"{ms(percentile(latency, 50))} {ms(percentile(latency, 95))} {ms(percentile(latency, 99))} "
+        f"{ms(percentile(first_text, 50))} {ms(percentile(first_text, 95))} "
+        f"{ms(percentile(first_audio, 50))} {ms(percentile(first_audio, 95))}"
+    )
+
+
+HEADER = (
+    f"{'endpoint':<21} {'conc':>4} {'ok/total':>9} {'req/s':>7} "
+    f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'ttft50':>7} {'ttft95':>7} {'ttfa50':>7} {'ttfa95':>7}"
+)
+
+
+async def print_stage_breakdown(http: httpx.AsyncClient):
+    """Mean time per pipeline stage, from the server's /metrics histograms"""
+    text = (await http.get("/metrics")).text
+    totals = {}
+    for line in text.splitlines():
+        for suffix in ("_sum", "_count"):
+            prefix = f"personifai_stage_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                stage, _, value = line[len(prefix):].partition("\"} ")
+                totals.setdefault(stage, {})[suffix] = float(value)
+    print(f"\n{'stage':<18} {'count':>6} {'mean ms':>8}")
+    for stage, t in sorted(totals.items()):
+        if t.get("_count"):
+            print(f"{stage:<18} {int(t['_count']):>6} {t['_sum'] / t['_count'] * 1000:8.1f}")
+
+
+async def probe_first_tts(http: httpx.AsyncClient, ctx: dict) -> int | None:
+    """Reply characters streamed when the probe reply's first TTS call arrived"""
+    fake = ctx["fake"]
+    fake.state.next_reply = PROBE_REPLY
+    fake.state.streamed = 0
+    fake.state.first_tts_streamed = None
+    r = await http.post("/send-message", json={"friend_id": ctx["friends"][0], "message": f"probe {uuid.uuid4().hex}"})
+    if r.status_code != 200 or not r.json().get("success"):
+        raise RuntimeError(f"probe message failed: {r.text}")
+    return fake.state.first_tts_streamed
+
+
+async def probe_oversize_upload(http: httpx.AsyncClient, ctx: dict, declare_length: bool) -> tuple:
+    """(status, or None if the server hung up; body bytes the app read) for an oversize /create-friend upload"""
+    head = (
+        b"--bench\r\nContent-Disposition: form-data; name=\"image\"; filename=\"big.jpeg\"\r\n"
+        b"Content-Type: image/jpeg\r\n\r\n"
+    )
+    chunk = b"\0" * (1024 * 1024)
+    chunks = ctx["upload_limit"] * OVERSIZE_FACTOR // len(chunk)
+
+    async def body():
+        yield head
+        for _ in range(chunks):
+            yield chunk
+
+    headers = {"Content-Type": "multipart/form-data; boundary=bench"}
+    if declare_length:
+        headers["Content-Length"] = str(len(head) + chunks * len(chunk))
+    ctx["body_bytes_read"]["/create-friend"] = 0
+    try:
+        status = (await http.post("/create-friend", content=body(), headers=headers)).status_code
+    except httpx.TransportError:
+        status = None
+    return status, ctx["body_bytes_read"]["/create-friend"]
+
+
+async def run_bench(base_url: str, args, ctx: dict):
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as http:
+        # One friend per client, so concurrent clients never share a thread
+        ctx["friends"] = []
+        for i in range(max(args.concurrency)):
+            friend_id = f"bench-{i}"
+            r = await http.post(
+                "/create-friend",
+                files={"image": ("bench.jpeg", ctx["image"], "image/jpeg")},
+                data={"name": f"Lamp {i}", "personality": "", "image_id": friend_id},
+            )
+            if r.status_code != 200 or not r.json().get("success"):
+                raise RuntimeError(f"could not create benchmark friend: {r.text}")
+            ctx["friends"].append(friend_id)
+
+        print(HEADER, flush=True)
+        for endpoint in args.endpoints:
+            await run_level(http, ctx, endpoint, 1, 1)  # warm-up
+            for concurrency in args.concurrency:
+                samples, elapsed = await run_level(http, ctx, endpoint, concurrency, max(args.requests, concurrency))
+                print(summarize(endpoint, concurrency, samples, elapsed), flush=True)
+
+        await print_stage_breakdown(http)
+
+        streamed = await probe_first_tts(http, ctx)
+        print(f"\n🔎 First TTS call after {streamed} of {len(PROBE_REPLY)} reply characters (limit {PROBE_LIMIT})")
+        passed = streamed is not None and streamed < PROBE_LIMIT
+
+        size = ctx["upload_limit"] * OVERSIZE_FACTOR
+        for declare_length in (True, False):
+            status, read = await probe_oversize_upload(http, ctx, declare_length)
+            label = "with Content-Length" if declare_length else "chunked"
+            print(f"🔎 {size / 2**20:.0f} MB upload {label}: {status or 'connection closed'} after the app read {read / 2**20:.1f} MB")
+            passed &= status in (413, None) and read < size
+        return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per endpoint and concurrency level")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--reply-chars", type=int, default=300, help="length of each streamed reply")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Backboard tokens/sec per reply")
+    parser.add_argument("--chars-per-token", type=int, default=4)
+    parser.add_argument("--backboard-latency", type=float, default=0.2, help="seconds to first token / per API call")
+    parser.add_argument("--gemini-latency", type=float, default=1.5, help="seconds per image analysis")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds per ElevenLabs call")
+    parser.add_argument("--tts-per-char", type=float, default=0.002, help="extra TTS seconds per character")
+    parser.add_argument("--stt-latency", type=float, default=0.5, help="seconds per clip for the fake STT")
+    parser.add_argument("--real-stt", action="store_true", help="use the Whisper pool instead of the fake")
+    parser.add_argument("--audio", help="voice clip to send (default: 1s of silence, needs the fake STT)")
+    parser.add_argument("--image", help="image to upload (default: a generated 1600x1200 JPEG)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show the server's INFO logs")
+    args = parser.parse_args()
+
+    if args.real_stt and not args.audio:
+        parser.error("--real-stt needs --audio with actual speech")
+
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    fake_port = free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    # Must be set before vic_main is imported (friend store + clients read them)
+    os.environ.update({
+        "BACKBOARD_API_KEY": "bench",
+        "BACKBOARD_BASE_URL": f"{fake_url}/api",
+        "ELEVENLABS_API_KEY": "bench",
+        "ELEVENLABS_BASE_URL": fake_url,
+        "TTS_CACHE_DIR": os.path.join(workdir, "tts_cache"),
+        "FRIEND_DB_PATH": os.path.join(workdir, "friends.db"),
+        "LOG_LEVEL": "INFO" if args.verbose else "WARNING",
+    })
+    # Measure the pipeline, not admission control: lift the 429 limits unless set explicitly
+    for name in ("CREATE_FRIEND", "VOICE_MESSAGE", "GENERATE_3D"):
+        os.environ.setdefault(f"{name}_MAX_CONCURRENCY", str(max(args.concurrency)))
+        os.environ.setdefault(f"{name}_MAX_QUEUE", str(max(args.concurrency)))
+    from app import image_chatbot, vic_main
+
+    async def analyze(image_path, image_data=None):
+        return await fake_analyze_image(image_path, args.gemini_latency)
+    image_chatbot.analyze_image_for_assistant = analyze
+    if not args.real_stt:
+        vic_main.audio_stt = lambda **kwargs: FakeSTT(args.stt_latency)
+
+    fake = build_fake_services(args)
+    ctx = {
+        "fake": fake,
+        "upload_limit": vic_main.UPLOAD_MAX_BYTES,
+        "body_bytes_read": {},
+        "image": open(args.image, "rb").read() if args.image else sample_jpeg(),
+        "audio": open(args.audio, "rb").read() if args.audio else silent_wav(),
+    }
+
+    print(f"🏁 reply {args.reply_chars} chars @ {args.token_rate:g} tok/s, backboard {args.backboard_latency}s, "
+           f"gemini {args.gemini_latency}s, tts {args.tts_latency}s + {args.tts_per_char}s/char, "
+           f"stt {'whisper' if args.real_stt else f'{args.stt_latency}s'}\n")
+    try:
+        with serve(fake, fake_port), serve(count_body_bytes(vic_main.app, ctx["body_bytes_read"]), free_port()) as app_url:
+            passed = asyncio.run(run_bench(app_url, args, ctx))
+    finally:
+        # /create-friend saves uploads next to the real models; drop the benchmark ones
+        models_dir = os.path.join(os.path.dirname(vic_main.__file__), "..", "public", "models")
+        for name in os.listdir(models_dir) if os.path.isdir(models_dir) else []:
+            if name.startswith("bench-"):
+                os.remove(os.path.join(models_dir, name))
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from app.metrics import CACHE_LOOKUPS
+
+WHITESPACE_RE = re.compile(r"\s+")
+# Trailing punctuation that doesn't change what was asked ("hi!!" == "hi")
+TRAILING_RE = re.compile(r"[\s.!?,~…]+$")
+
+# (seconds since the previous event, event)
+CachedReply = List[Tuple[float, dict]]
+
+
+class ResponseCache:
+    """
+    Exact-match cache of chat replies, for friends that opt in.
+    Keys hash the normalized prompt together with the assistant's description,
+    so friends with the same persona share entries. A cached reply keeps every
+    {clean_text, commands, is_end} event and the gap before it, which lets a
+    hit be replayed at the original streaming pace (scaled by `replay_speed`;
+    0 replays instantly). Entries expire after `ttl` seconds, and at most
+    `max_entries` are kept (least recently used evicted). Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, replay_speed: float = 1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.replay_speed = replay_speed
+        self.lock = threading.Lock()
+
+        # key -> (expires_at, reply)
+        self.entries: "OrderedDict[str, Tuple[float, CachedReply]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        return TRAILING_RE.sub("", WHITESPACE_RE.sub(" ", prompt).strip().lower())
+
+    @staticmethod
+    def persona(description: str, *variant) -> str:
+        """Namespace of replies that are interchangeable: same description and, via `variant`, same chunking"""
+        raw = "\x00".join([description, *map(str, variant)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def key(prompt: str, persona: str) -> str:
+        raw = "\x00".join([ResponseCache.normalize_prompt(prompt), persona])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedReply]:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and item[0] <= time.time():
+                del self.entries[key]
+                self.expired += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="exact", result="miss")
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="exact", result="hit")
+            return item[1]
+
+    def put(self, key: str, reply: CachedReply):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, reply)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+async def replay(reply: CachedReply, speed: float = 1.0) -> AsyncIterator[dict]:
+    """Yield a cached reply's events with their original gaps (divided by `speed`; 0 = instant)"""
+    for gap, event in reply:
+        if gap and speed:
+            await asyncio.sleep(gap / speed)
+        yield _copy(event)
+
+
+async def record(events: AsyncIterator[dict], on_complete: Callable[[CachedReply], None]) -> AsyncIterator[dict]:
+    """Pass `events` through; hand the recording to `on_complete` if the reply finished (is_end)"""
+    recorded = []
+    last = time.perf_counter()
+    async for event in events:
+        now = time.perf_counter()
+        # The first gap is LLM latency, which a hit shouldn't reproduce
+        recorded.append((now - last if recorded else 0.0, _copy(event)))
+        last = now
+        yield event
+    if recorded and recorded[-1][1].get("is_end"):
+        on_complete(recorded)
+
+
+def _copy(event: dict) -> dict:
+    # Callers rewrite clean_text in place, so never hand out the stored dicts
+    return {**event, "commands": list(event.get("commands", []))}
@@ -0,0 +1,128 @@
+"""
+Semantic cache calibration: labelled prompt pairs through the real embedder.
+
+Usage (from server/):
+    python -m app.semantic_bench [--threshold 0.9] [--model BAAI/bge-small-en-v1.5]
+
+Each pair is a prompt whose reply is cached, the commands that reply carried,
+and a new prompt, labelled as a paraphrase (the cached reply, actions and
+all, is a fine answer) or not. For every threshold each pair's reply is put
+in a SemanticCache and the new prompt looked up in it, counting how many
+paraphrases are served from cache (recall) and how many non-paraphrases
+wrongly are (false accepts). Exits non-zero if `--threshold` (default:
+SEMANTIC_CACHE_THRESHOLD or 0.9) serves any non-paraphrase, so it doubles as
+a check after changing the model.
+Downloads the embedding model on first run.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.semantic_cache import DEFAULT_MODEL, SemanticCache, load_embedder
+
+# (cached prompt, commands in its cached reply, new prompt, is a paraphrase)
+PAIRS = [
+    # Paraphrases: greetings, small talk and requests a cached reply answers well
+    ("hello!", ["WAVE"], "hey there", True),
+    ("hi", ["WAVE"], "hello", True),
+    ("good morning", [], "morning!", True),
+    ("how are you?", [], "how are you doing?", True),
+    ("how are you today", [], "how's it going today?", True),
+    ("what's your name?", [], "what is your name", True),
+    ("who are you?", [], "who are you exactly?", True),
+    ("what do you do?", [], "what do you do all day?", True),
+    ("tell me a joke", [], "tell me something funny", True),
+    ("tell me a joke", [], "do you know any jokes?", True),
+    ("thank you!", [], "thanks a lot", True),
+    ("goodbye", ["WAVE"], "bye, see you later", True),
+    ("can you jump?", ["JUMP"], "could you jump for me?", True),
+    ("do a little dance", ["WOBBLE"], "dance for me, wobble!", True),
+    ("wave at me", ["WAVE"], "can you wave hello?", True),
+    ("spin around", ["SPIN"], "do a spin", True),
+    ("what's your favorite color?", [], "which color do you like best?", True),
+    ("are you happy?", [], "are you feeling happy?", True),
+    ("do you like music?", [], "do you enjoy music?", True),
+    ("what makes you happy?", [], "what makes you feel happy?", True),
+    # Non-paraphrases: similar wording, different question or different action
+    ("do a jump", ["JUMP"], "do a wave", False),
+    ("can you jump?", ["JUMP"], "can you spin?", False),
+    ("wave at me", ["WAVE"], "jump at me", False),
+    ("spin around", ["SPIN"], "turn around and wobble", False),
+    ("how are you?", [], "how old are you?", False),
+    ("how are you?", [], "where are you?", False),
+    ("what's your name?", [], "what's my name?", False),
+    ("do you like music?", [], "do you like cats?", False),
+    ("do you like music?", [], "do you hate music?", False),
+    ("what's your favorite color?", [], "what's your favorite food?", False),
+    ("are you happy?", [], "are you sad?", False),
+    ("tell me a joke", [], "tell me a story", False),
+    ("good morning", [], "good night", False),
+    ("hello!", ["WAVE"], "help!", False),
+    ("what do you do?", [], "what did you do yesterday?", False),
+    ("who are you?", [], "who am I?", False),
+    ("what makes you happy?", [], "what makes you angry?", False),
+    ("thank you!", [], "no thank you", False),
+    ("i love you", [], "i hate you", False),
+    ("can you sing?", [], "can you swim?", False),
+]
+
+THRESHOLDS = [round(t, 2) for t in np.arange(0.80, 0.991, 0.01)]
+
+
+def evaluate(embed, cached: np.ndarray, new: np.ndarray, threshold: float) -> tuple:
+    """(paraphrases served, non-paraphrases served) by SemanticCache.lookup at `threshold`"""
+    cache = SemanticCache(embed, threshold=threshold, max_entries=len(PAIRS))
+    hits = false = 0
+    for i, (cached_prompt, commands, _, label) in enumerate(PAIRS):
+        # One persona per pair, so each new prompt only sees its own cached reply
+        reply = [(0.0, {"clean_text": f"Reply to {cached_prompt!r}", "commands": commands, "is_end": True})]
+        cache.add(f"pair-{i}", cached[i], reply)
+        if cache.lookup(f"pair-{i}", new[i]) is not None:
+            hits += label
+            false += not label
+    return hits, false
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")))
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    embed = load_embedder(args.model)
+    cached = embed([cached for cached, *_ in PAIRS])
+    new = embed([new for _, _, new, _ in PAIRS])
+    similarities = np.sum(cached * new, axis=1)
+    print(f"{args.model}: {len(PAIRS)} pairs embedded in {time.perf_counter() - start:.1f}s\n")
+
+    positives = sum(label for *_, label in PAIRS)
+    negatives = len(PAIRS) - positives
+    print(f"{'threshold':>9}  {'recall':>8}  {'false accepts':>13}")
+    results = {threshold: evaluate(embed, cached, new, threshold) for threshold in THRESHOLDS}
+    for threshold, (hits, false) in results.items():
+        marker = "  <-" if threshold == round(args.threshold, 2) else ""
+        print(f"{threshold:>9.2f}  {hits / positives:>8.0%}  {false:>6}/{negatives:<6}{marker}")
+
+    safe = [t for t in THRESHOLDS if results[t][1] == 0]
+    if safe:
+        hits, _ = results[safe[0]]
+        print(f"\nLowest threshold with no false accepts: {safe[0]:.2f} (recall {hits / positives:.0%})")
+
+    print("\nClosest non-paraphrases:")
+    order = np.argsort(-similarities)
+    for index in [i for i in order if not PAIRS[i][3]][:5]:
+        cached_prompt, _, new_prompt, _ = PAIRS[index]
+        print(f"  {similarities[index]:.3f}  {cached_prompt!r} vs {new_prompt!r}")
+
+    hits, false = evaluate(embed, cached, new, args.threshold)
+    print(f"\nAt {args.threshold:.2f}: recall {hits / positives:.0%}, {false} false accepts")
+    if false:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
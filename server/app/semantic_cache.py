@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from fastembed import TextEmbedding
+except ImportError:  # semantic matching is skipped without fastembed
+    TextEmbedding = None
+
+from app.metrics import CACHE_LOOKUPS
+from app.response_cache import CachedReply
+
+DEFAULT_MODEL = "BAAI/bge-small-en-v1.5"
+
+
+def load_embedder(model_name: str = DEFAULT_MODEL, threads: int = 1) -> Callable[[List[str]], np.ndarray]:
+    """
+    A small local CPU embedding model (ONNX via fastembed); downloads the
+    model on first use. Returns texts -> unit vectors, shape (n, dim).
+    """
+    if TextEmbedding is None:
+        raise RuntimeError("fastembed is not installed")
+    model = TextEmbedding(model_name, threads=threads)
+
+    def embed(texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(list(model.embed(texts)), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return embed
+
+
+class _Namespace:
+    """Unit vectors of one persona's cached prompts, one row per entry"""
+
+    def __init__(self, dim: int):
+        self.ids: List[int] = []
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+
+
+class SemanticCache:
+    """
+    Reuses a reply for a prompt that means the same as one already answered
+    for the same persona ("hello!" / "hey there"), where the exact-match
+    ResponseCache would miss. Prompts are embedded with `embed`, a small local
+    model, and stored per persona in a NumPy matrix. A lookup is a brute-force
+    dot product: with unit vectors that is the cosine similarity, and a few
+    thousand rows take well under a millisecond. A hit needs similarity of at
+    least `threshold`, and replays the cached reply [[COMMANDS]] included, as
+    an exact hit does; the threshold is calibrated with semantic_bench.py so
+    that "do a wave" doesn't match "do a jump". Only prompts up to
+    `max_prompt_chars` are considered, because longer ones carry specifics a
+    paraphrase match would get wrong. Entries expire after `ttl` seconds, and
+    at most `max_entries` are kept (least recently used evicted). Thread-safe.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], np.ndarray],
+        threshold: float = 0.9,
+        max_entries: int = 2048,
+        ttl: float = 3600.0,
+        max_prompt_chars: int = 200,
+    ):
+        self.embed_texts = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_prompt_chars = max_prompt_chars
+        self.lock = threading.Lock()
+
+        self.namespaces: Dict[str, _Namespace] = {}
+        # entry id -> (persona, expires_at, reply), least recently used first
+        self.entries: "OrderedDict[int, Tuple[str, float, CachedReply]]" = OrderedDict()
+        self.next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.similarity_sum = 0.0
+        self.chars_saved = 0
+
+    def accepts(self, prompt: str) -> bool:
+        return 0 < len(prompt.strip()) <= self.max_prompt_chars
+
+    def embed(self, prompt: str) -> np.ndarray:
+        """Unit vector for `prompt` (CPU-bound; run in a worker thread)"""
+        return self.embed_texts([prompt.strip()])[0]
+
+    def lookup(self, persona: str, vector: np.ndarray) -> Optional[CachedReply]:
+        """Reply of the most similar cached prompt of this persona, if similar enough"""
+        with self.lock:
+            reply, similarity = self._nearest(persona, vector)
+            if reply is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="semantic", result="miss")
+                return None
+            self.hits += 1
+            self.similarity_sum += similarity
+            self.chars_saved += sum(len(event.get("clean_text", "")) for _, event in reply)
+            CACHE_LOOKUPS.inc(cache="semantic", result="hit")
+            return reply
+
+    def add(self, persona: str, vector: np.ndarray, reply: CachedReply):
+        with self.lock:
+            namespace = self.namespaces.get(persona)
+            if namespace is None:
+                namespace = self.namespaces[persona] = _Namespace(vector.shape[0])
+            entry_id = self.next_id
+            self.next_id += 1
+            namespace.ids.append(entry_id)
+            namespace.matrix = np.vstack([namespace.matrix, vector[None, :].astype(np.float32)])
+            self.entries[entry_id] = (persona, time.time() + self.ttl, reply)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "personas": len(self.namespaces),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "mean_hit_similarity": round(self.similarity_sum / self.hits, 4) if self.hits else None,
+                "llm_calls_saved": self.hits,
+                "reply_chars_saved": self.chars_saved,
+            }
+
+    # ---- internals (caller holds the lock) ----
+
+    def _nearest(self, persona: str, vector: np.ndarray):
+        namespace = self.namespaces.get(persona)
+        now = time.time()
+        while namespace is not None and len(namespace.ids):
+            similarities = namespace.matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None, 0.0
+            entry_id = namespace.ids[best]
+            _, expires_at, reply = self.entries[entry_id]
+            if expires_at > now:
+                self.entries.move_to_end(entry_id)
+                return reply, float(similarities[best])
+            # Expired: drop it and look for the next best match
+            self._remove(entry_id)
+            namespace = self.namespaces.get(persona)
+        return None, 0.0
+
+    def _remove(self, entry_id: int):
+        persona, _, _ = self.entries.pop(entry_id)
+        namespace = self.namespaces[persona]
+        row = namespace.ids.index(entry_id)
+        del namespace.ids[row]
+        namespace.matrix = np.delete(namespace.matrix, row, axis=0)
+        if not namespace.ids:
+            del self.namespaces[persona]
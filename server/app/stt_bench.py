@@ -0,0 +1,167 @@
+"""
+STT throughput benchmark: one-clip-per-call workers vs batched mode.
+
+Usage (from server/):
+    python -m app.stt_bench [audio_file] [--model base] [--workers 1] [--batch-size 8]
+    python -m app.stt_bench --fake-model
+
+Every client sends `--clips` transcriptions back to back; the script reports
+clips/sec for 1, 4 and 16 concurrent clients in both modes.
+
+--fake-model swaps Whisper for a deterministic stand-in (a fixed cost per
+pass plus a smaller cost per clip in it, like a real batched decoder), so
+the pool's scheduling can be measured without the model weights. Each client
+then sends its own synthetic clip, some longer than Whisper's 30 s window,
+and the run fails if any transcription comes back for the wrong clip or if
+batched mode never put concurrent clips in the same pass.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+from app import audio_stt as stt_module
+from app.audio_stt import SAMPLE_RATE, audio_stt, load_audio
+
+AUDIO_FILE = os.path.join(os.path.dirname(__file__), "recorded.wav")
+CONCURRENCY = [1, 4, 16]
+
+# Stand-in costs (seconds): one pass, plus each clip row in it
+FAKE_PASS_SECONDS = 0.1
+FAKE_CLIP_SECONDS = 0.01
+
+
+class FakeSegment:
+    def __init__(self, text: str, seek: int = 0):
+        self.text = text
+        self.seek = seek
+
+
+def _label(audio: np.ndarray) -> str:
+    # Synthetic clips are constant, with the value encoding the clip number
+    return f" clip{round(float(audio[0]) * 1000)}"
+
+
+class FakeWhisperModel:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def transcribe(self, audio, **kwargs):
+        # One decoder pass per 30 s window, one after another
+        windows = range(0, len(audio), stt_module.CHUNK_SAMPLES)
+        time.sleep(len(windows) * (FAKE_PASS_SECONDS + FAKE_CLIP_SECONDS))
+        return iter([FakeSegment(_label(audio[start:])) for start in windows]), None
+
+
+class FakeBatchedPipeline:
+    """Mimics BatchedInferencePipeline: one segment per clip_timestamps row, `seek` = row start in frames"""
+
+    batch_sizes = []
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, clip_timestamps=(), batch_size=8, **kwargs):
+        self.batch_sizes.append(len(clip_timestamps))
+        rows = -(-len(clip_timestamps) // batch_size)
+        time.sleep(rows * FAKE_PASS_SECONDS + len(clip_timestamps) * FAKE_CLIP_SECONDS)
+        segments = []
+        for clip in clip_timestamps:
+            start = int(clip["start"] * SAMPLE_RATE)
+            segments.append(FakeSegment(_label(audio[start:]), seek=int(start / SAMPLE_RATE * 100)))
+        return iter(segments), None
+
+
+def fake_clips(count: int) -> list:
+    """(audio, expected text) per client; every third clip spans two Whisper windows"""
+    clips = []
+    for k in range(1, count + 1):
+        seconds = 40 if k % 3 == 0 else 2 + k % 5
+        audio = np.full(seconds * SAMPLE_RATE, k / 1000, dtype=np.float32)
+        pieces = -(-seconds // 30)
+        clips.append((audio, " ".join([f"clip{k}"] * pieces)))
+    return clips
+
+
+async def run_clients(stt: audio_stt, clips: list, clients: int, per_client: int) -> tuple:
+    """Run `clients` concurrent senders; returns (clips/sec, wrong transcriptions)"""
+    wrong = 0
+
+    async def client(audio, expected):
+        nonlocal wrong
+        for _ in range(per_client):
+            text = await stt.transcribe(audio)
+            if expected is not None and text != expected:
+                wrong += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(*clips[i % len(clips)]) for i in range(clients)])
+    elapsed = time.perf_counter() - start
+    return clients * per_client / elapsed, wrong
+
+
+async def bench_mode(label: str, stt: audio_stt, clips: list, per_client: int) -> tuple:
+    # Warm up so model load / first-call overhead isn't measured
+    await stt.transcribe(clips[0][0])
+
+    results, wrong = {}, 0
+    for clients in CONCURRENCY:
+        rate, mismatches = await run_clients(stt, clips, clients, per_client)
+        results[clients] = rate
+        wrong += mismatches
+        print(f"  {label:<8} {clients:>3} clients: {rate:6.2f} clips/sec")
+    return results, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_file", nargs="?", default=AUDIO_FILE)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-window", type=float, default=0.05)
+    parser.add_argument("--clips", type=int, default=4, help="clips per client")
+    parser.add_argument("--fake-model", action="store_true", help="deterministic stand-in for Whisper")
+    args = parser.parse_args()
+
+    if args.fake_model:
+        stt_module.WhisperModel = FakeWhisperModel
+        stt_module.BatchedInferencePipeline = FakeBatchedPipeline
+        clips = fake_clips(max(CONCURRENCY))
+        print(f"🎧 Fake model: {len(clips)} distinct clips, {args.workers} worker(s)\n")
+    else:
+        # Decode once so both modes measure inference, not file IO
+        audio = load_audio(open(args.audio_file, "rb").read())
+        clips = [(audio, None)]
+        print(f"🎧 {args.audio_file}: {len(audio) / SAMPLE_RATE:.1f}s of audio, model '{args.model}', {args.workers} worker(s)\n")
+
+    modes = [
+        ("single", dict(batch_size=1)),
+        ("batched", dict(batch_size=args.batch_size, batch_window=args.batch_window)),
+    ]
+    results, wrong = {}, 0
+    for label, options in modes:
+        stt = audio_stt(model_name=args.model, device=args.device, num_workers=args.workers, **options)
+        try:
+            results[label], mismatches = asyncio.run(bench_mode(label, stt, clips, args.clips))
+            wrong += mismatches
+        finally:
+            stt.stop()
+
+    print("\n📊 Speedup (batched / single):")
+    for clients in CONCURRENCY:
+        print(f"  {clients:>3} clients: {results['batched'][clients] / results['single'][clients]:.2f}x")
+
+    if args.fake_model:
+        sizes = FakeBatchedPipeline.batch_sizes
+        print(f"\n🔎 Batched passes: {len(sizes)}, largest {max(sizes)} clip rows; wrong transcriptions: {wrong}")
+        if wrong or max(sizes) < 2:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class TTSCache:
+    """
+    Content-addressed cache for synthesized speech.
+    Keys hash (text, voice_id, model_id, output_format). A bounded in-memory
+    LRU sits in front of an on-disk tier of MP3 files (also bounded, oldest
+    evicted first); disk hits are promoted back into memory.
+    Thread-safe, so the threaded audio_tts worker can share it.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_memory_bytes: int = 16 * 1024 * 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.lock = threading.Lock()
+
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_bytes = 0
+
+        # key -> size, oldest first (rebuilt from mtimes on startup)
+        self.disk: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_stored = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+        raw = "\x00".join([text.strip(), voice_id, model_id, output_format])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio for `key`, or None on a miss"""
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                self.bytes_served += len(data)
+                return data
+            on_disk = key in self.disk
+
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))  # keeps eviction order across restarts
+            except OSError:
+                data = None
+
+            with self.lock:
+                if data is None:
+                    self._forget_disk(key)
+                else:
+                    if key in self.disk:
+                        self.disk.move_to_end(key)
+                    self.disk_hits += 1
+                    self.bytes_served += len(data)
+                    self._remember(key, data)
+                    return data
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        """Store freshly synthesized audio in both tiers"""
+        if not data:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            path = None
+
+        with self.lock:
+            self.bytes_stored += len(data)
+            self._remember(key, data)
+            if path is not None:
+                self._forget_disk(key, delete=False)
+                self.disk[key] = len(data)
+                self.disk_bytes += len(data)
+                while self.disk_bytes > self.max_disk_bytes and len(self.disk) > 1:
+                    old_key = next(iter(self.disk))
+                    self._forget_disk(old_key)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "bytes_served": self.bytes_served,
+                "bytes_stored": self.bytes_stored,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_entries": len(self.disk),
+                "disk_bytes": self.disk_bytes,
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def _remember(self, key: str, data: bytes):
+        # Caller holds the lock
+        if len(data) > self.max_memory_bytes:
+            return
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= len(old)
+        self.memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _forget_disk(self, key: str, delete: bool = True):
+        # Caller holds the lock
+        size = self.disk.pop(key, None)
+        if size is None:
+            return
+        self.disk_bytes -= size
+        if delete:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+                continue
+            if not name.endswith(".mp3"):
+                continue
+            st = os.stat(path)
+            entries.append((st.st_mtime, name[:-len(".mp3")], st.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
@@ -11,29 +11,90 @@ import sys
 import requests
 import time
 import asyncio
-from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi import FastAPI, Request, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse, Response
 import httpx
 from pydantic import BaseModel
 import base64
-from app.image_chatbot import create_chatbot_assistant, interactive_chat
-from app.audio_stt import audio_stt
-from app.audio_tts import audio_tts
+from app.image_chatbot import (
+    create_chatbot_assistant,
+    interactive_chat,
+    init_backboard_client,
+    get_backboard_client,
+    close_backboard_client,
+    backboard_stats,
+    target_chunk_size,
+)
+from app.llm_parser import SentenceSplitter
+from app.audio_store import AudioStore, parse_range
+from app.tts_cache import TTSCache
+from app.friend_store import create_friend_store
+from app.audio_stt import audio_stt, stt_stream, default_num_workers
+from app.audio_tts import audio_tts, async_tts
+from app.meshy_jobs import MeshyJobManager, MESHY_API_URL
+from app.model_cache import ModelCache, ENCODINGS, accepted_encodings
+from app.model_optimizer import ModelOptimizer, LODS
+from app.image_ingest import save_upload, normalize_image, data_url, ImageTooLarge, UploadSizeLimit
+from app.admission import ConcurrencyLimiter, Overloaded
+from app.friend_turns import FriendTurns
+from app.response_cache import ResponseCache, replay, record
+from app.semantic_cache import SemanticCache, load_embedder, DEFAULT_MODEL as EMBEDDING_MODEL
+from app.metrics import span, render_metrics, configure_logging, REQUEST_SECONDS, REJECTED_TOTAL
 from contextlib import asynccontextmanager
 import json
+import re
 from typing import Dict, List
 import tempfile
 import os
 import io
+import logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 MODEL_DIR = "../frontend/PersonifAI/public/models"
+# Model index, precompressed variants and LODs; kept out of the git-tracked frontend tree
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "model_cache"))
 
 MESHY_API_KEY = os.getenv("MESHY_API_KEY")
 
+STT_TIMEOUT = 60  # seconds to wait for a transcription
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "20")) * 1024 * 1024
+UPLOAD_FORM_SLACK = 64 * 1024  # multipart boundaries and the other form fields
+IMAGE_MAX_SIZE = int(os.getenv("IMAGE_MAX_SIZE", "1024"))  # px, longest edge after normalization
+
+FRIEND_DB_PATH = os.getenv("FRIEND_DB_PATH", os.path.join(os.path.dirname(__file__), "..", "friends.db"))
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "tts_cache"))
+
+WHITESPACE_RE = re.compile(r"\s+")
+# image_ids become file names (uploads, models, aliases), so no path separators or dots
+IMAGE_ID_RE = re.compile(r"[A-Za-z0-9_-]+")
+IMAGE_ID_ERROR = "image_id may only contain letters, digits, '_' and '-'"
+
 tts_audio_worker = None
+tts_client = None
+meshy_jobs = None
+model_cache = None
+model_optimizer = None
+stt_audio_worker = None
 assistant_info_cache = None
-friends_db: Dict = {}  # {friend_id: {name, personality, assistant_info, model_url, created_at}}
+# route path -> ConcurrencyLimiter for the endpoints that start heavy work
+limiters = {}
+response_cache = None
+semantic_cache = None
+# {friend_id: {name, personality, assistant_info, model_url, created_at}}, persisted
+# in SQLite so friends survive restarts and can be shared between workers
+friends_db = create_friend_store(os.getenv("FRIEND_STORE", "sqlite"), FRIEND_DB_PATH)
+# audio_store, friend_turns, meshy_jobs, the caches and limiters live in this
+# process's memory, so the app supports one worker process only (see README.md)
+audio_store = AudioStore()  # reply audio served from /audio/{audio_id}
+# One turn at a time per friend thread; messages sent during a turn are merged into the next.
+# CHAT_COALESCE_WINDOW > 0 also merges messages that arrive that close together, but adds
+# the window to every turn's latency
+friend_turns = FriendTurns(window=float(os.getenv("CHAT_COALESCE_WINDOW", "0")))
 
 IMAGE_PATH = r"D:\Personal Projects\Circuit-Breakers\server\app\graces_airpods.jpg"
 
@@ -41,19 +102,156 @@ IMAGE_PATH = r"D:\Personal Projects\Circuit-Breakers\server\app\graces_airpods.j
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup + shutdown without deprecated on_event."""
-    global tts_audio_worker, assistant_info_cache
+    global tts_audio_worker, tts_client, stt_audio_worker, assistant_info_cache, meshy_jobs, model_cache, model_optimizer, limiters, response_cache, semantic_cache
 
     # ---- STARTUP ----
-    print("✅ Backend ready (VIC Edition)")
+    # Load the Whisper pool ONCE, shared by every voice request
+    # STT_BATCH_SIZE > 1 makes each worker transcribe up to that many queued clips
+    # (gathered for at most STT_BATCH_WINDOW seconds) in one batched pass
+    num_workers = default_num_workers()
+    stt_batch_size = int(os.getenv("STT_BATCH_SIZE", "1"))
+    stt_audio_worker = audio_stt(
+        model_name="base",
+        device="cpu",
+        language="en",
+        num_workers=num_workers,
+        batch_size=stt_batch_size,
+        batch_window=float(os.getenv("STT_BATCH_WINDOW", "0.05")),
+    )
+    logger.info(f"✅ STT pool started ({num_workers} workers, batch size {stt_batch_size})")
+
+    # One Backboard client (keep-alive pool) shared by every friend
+    if os.getenv("BACKBOARD_API_KEY"):
+        await init_backboard_client(
+            max_connections=int(os.getenv("BACKBOARD_MAX_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("BACKBOARD_KEEPALIVE", "60")),
+        )
+        logger.info("✅ Backboard client ready")
+    else:
+        logger.warning("⚠️ BACKBOARD_API_KEY not configured")
+
+    # One pooled, non-blocking ElevenLabs client for every reply
+    if eleven_api_key := os.getenv("ELEVENLABS_API_KEY"):
+        tts_client = async_tts(
+            api_key=eleven_api_key,
+            max_concurrency=int(os.getenv("TTS_MAX_CONCURRENCY", "4")),
+            timeout=float(os.getenv("TTS_TIMEOUT", "30")),
+            base_url=os.getenv("ELEVENLABS_BASE_URL"),
+            cache=TTSCache(
+                TTS_CACHE_DIR,
+                max_memory_bytes=int(os.getenv("TTS_CACHE_MEMORY_MB", "16")) * 1024 * 1024,
+                max_disk_bytes=int(os.getenv("TTS_CACHE_DISK_MB", "256")) * 1024 * 1024,
+            ),
+        )
+        logger.info("✅ TTS client ready")
+    else:
+        logger.warning("⚠️ ELEVENLABS_API_KEY not configured, replies will have no audio")
+
+    # Replies to repeated prompts, for friends that opt in
+    response_cache = ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        replay_speed=float(os.getenv("RESPONSE_CACHE_REPLAY_SPEED", "1")),
+    )
+
+    # Paraphrase matching behind it; loads (and on first run downloads) a local embedding model
+    if os.getenv("SEMANTIC_CACHE", "0") == "1":
+        try:
+            embed = await asyncio.to_thread(load_embedder, os.getenv("SEMANTIC_CACHE_MODEL", EMBEDDING_MODEL))
+            semantic_cache = SemanticCache(
+                embed,
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+                max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "2048")),
+                ttl=response_cache.ttl,
+                max_prompt_chars=int(os.getenv("SEMANTIC_CACHE_MAX_CHARS", "200")),
+            )
+            logger.info("✅ Semantic response cache ready")
+        except Exception as e:
+            logger.warning(f"⚠️ Semantic response cache disabled: {e}")
+
+    # Generated models, deduplicated by image hash
+    model_cache = ModelCache(
+        MODEL_DIR,
+        MODEL_CACHE_DIR,
+        max_bytes=int(os.getenv("MODEL_CACHE_MB", "1024")) * 1024 * 1024,
+        max_distance=int(os.getenv("MODEL_CACHE_MAX_DISTANCE", "6")),
+    )
+
+    # Low/high LODs of every model, built in worker processes
+    model_optimizer = ModelOptimizer(
+        MODEL_CACHE_DIR,
+        max_workers=int(os.getenv("MODEL_OPTIMIZE_WORKERS", "1")),
+        gltfpack=os.getenv("GLTFPACK_PATH"),
+        meshopt=os.getenv("MODEL_MESHOPT", "1") != "0",
+    )
+    if model_optimizer.gltfpack is None:
+        logger.warning("⚠️ gltfpack not found, model LODs use the built-in simplifier (no quantization or meshopt compression)")
+
+    # 3D generation runs as background jobs on their own connection pool
+    if MESHY_API_KEY:
+        meshy_jobs = MeshyJobManager(
+            cache=model_cache,
+            optimizer=model_optimizer,
+            api_key=MESHY_API_KEY,
+            model_dir=MODEL_DIR,
+            base_url=os.getenv("MESHY_BASE_URL", MESHY_API_URL),
+            max_concurrency=int(os.getenv("MESHY_MAX_CONCURRENCY", "4")),
+            max_pending=int(os.getenv("MESHY_MAX_PENDING", "64")),
+            timeout=float(os.getenv("MESHY_TIMEOUT", "600")),
+            max_image_bytes=UPLOAD_MAX_BYTES,
+        )
+        logger.info("✅ Meshy job manager ready")
+    else:
+        logger.warning("⚠️ MESHY_API_KEY not configured, /generate-3d is disabled")
+
+    # Admission control: bounded concurrency + bounded queue, 429 beyond that
+    limiters = {
+        path: ConcurrencyLimiter(
+            endpoint=path,
+            max_concurrency=int(os.getenv(f"{env}_MAX_CONCURRENCY", str(concurrency))),
+            max_queue=int(os.getenv(f"{env}_MAX_QUEUE", str(queue))),
+            queue_timeout=float(os.getenv(f"{env}_QUEUE_TIMEOUT", str(timeout))),
+        )
+        for path, env, concurrency, queue, timeout in (
+            ("/create-friend", "CREATE_FRIEND", 4, 8, 10),
+            ("/send-voice-message", "VOICE_MESSAGE", num_workers * 2, num_workers * 4, 5),
+            ("/generate-3d", "GENERATE_3D", 8, 16, 5),
+        )
+    }
+
+    logger.info("✅ Backend ready (VIC Edition)")
 
     yield
 
     # ---- SHUTDOWN ----
-    print("🛑 Backend shutdown complete.")
+    await close_backboard_client()
+
+    if meshy_jobs:
+        await meshy_jobs.aclose()
+
+    if model_optimizer:
+        model_optimizer.shutdown()
+
+    if tts_client:
+        await tts_client.aclose()
+
+    if stt_audio_worker:
+        logger.info("🛑 Stopping STT pool...")
+        stt_audio_worker.stop()
+        logger.info("🛑 STT pool stopped.")
+
+    logger.info("🛑 Backend shutdown complete.")
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Refuse oversize uploads before the multipart body is spooled (innermost, so
+# CORS headers and the latency metric still apply to the 413)
+app.add_middleware(UploadSizeLimit, limits={
+    "/create-friend": UPLOAD_MAX_BYTES + UPLOAD_FORM_SLACK,
+    "/send-voice-message": UPLOAD_MAX_BYTES + UPLOAD_FORM_SLACK,
+})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -63,10 +261,44 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Run limited endpoints inside a concurrency slot; 429 + Retry-After when full"""
+    limiter = limiters.get(request.url.path) if request.method == "POST" else None
+    if limiter is None:
+        return await call_next(request)
+    try:
+        async with limiter.slot():
+            return await call_next(request)
+    except Overloaded as e:
+        logger.warning(f"🚦 {e}, rejecting (retry after {e.retry_after}s)")
+        request.scope["admission_path"] = request.url.path  # route label for the latency metric
+        return JSONResponse(
+            content={"success": False, "error": "Server is busy, please retry shortly"},
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Feed personifai_request_seconds (for streamed responses: time until headers)"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=getattr(route, "path", request.scope.get("admission_path", "unmatched")),
+        status=response.status_code,
+    )
+    return response
+
+
 # ==================== Request Models ====================
 
 class ImageRequest(BaseModel):
-    image_url: str
+    image_url: str = ""  # empty: use the normalized upload of the friend with this image_id
     image_id: str = "default_image"
 
 class ChatRequest(BaseModel):
@@ -83,57 +315,205 @@ class SendMessageRequest(BaseModel):
     friend_id: str
     message: str
 
+class FriendSettingsRequest(BaseModel):
+    response_cache: bool | None = None  # replay cached replies to repeated prompts
+    memory: bool | None = None          # Backboard conversation memory (bypasses the cache)
+
 
 # ==================== Error Handler ====================
 
 @app.exception_handler(Exception)
 async def debug_exception_handler(request: Request, exc: Exception):
-    print("ERROR:", exc)
+    logger.error(f"ERROR: {exc}")
     return PlainTextResponse(str(exc), status_code=400)
 
 
 # ==================== Helper Functions ====================
 
-def generate_speech(text: str) -> bytes:
+async def generate_speech(text: str) -> bytes:
     """
-    Convert text to speech using ElevenLabs API.
+    Convert text to speech using the shared ElevenLabs client.
     Returns audio bytes in MP3 format.
     """
     try:
-        api_key = os.getenv("ELEVENLABS_API_KEY")
-        if not api_key:
-            print("⚠️ ELEVENLABS_API_KEY not configured, skipping audio generation")
+        if tts_client is None:
+            logger.debug("⚠️ ELEVENLABS_API_KEY not configured, skipping audio generation")
             return None
         
         if not text or len(text.strip()) == 0:
-            print("⚠️ Empty text, skipping audio generation")
+            logger.debug("⚠️ Empty text, skipping audio generation")
             return None
         
-        print(f"🔊 Generating speech for: {text[:50]}...")
-        
-        # Generate audio directly using ElevenLabs client
-        from elevenlabs.client import ElevenLabs
-        client = ElevenLabs(api_key=api_key)
-        
-        audio_stream = client.text_to_speech.convert(
-            text=text,
-            voice_id="21m00Tcm4TlvDq8ikWAM",  # Rachel voice
-            model_id="eleven_turbo_v2_5",  # Latest model available on free tier
-            output_format="mp3_44100_128"
-        )
-        
-        # Convert to bytes
-        audio_bytes = b"".join(audio_stream)
-        print(f"✅ Audio generated successfully: {len(audio_bytes)} bytes")
+        logger.debug(f"🔊 Generating speech for: {text[:50]}...")
+        with span("tts"):
+            audio_bytes = await tts_client.generate(text)
+        logger.debug(f"✅ Audio generated successfully: {len(audio_bytes)} bytes")
         
         return audio_bytes
+    except asyncio.TimeoutError:
+        logger.warning(f"❌ Speech generation timed out for: {text[:50]}...")
+        return None
     except Exception as e:
-        print(f"❌ Error in generate_speech: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Error in generate_speech: {e}")
         return None
 
 
+def normalize_clean_text(clean_text: str) -> str:
+    """Collapse the parser's multi-line output into single-spaced prose"""
+    lines = clean_text.split('\n')
+    cleaned_lines = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped:
+            cleaned_lines.append(stripped)
+    return ' '.join(cleaned_lines)
+
+
+def friend_settings(friend_data: dict) -> dict:
+    """Per-friend chat options stored on the friend record (both off by default)"""
+    return {
+        "response_cache": bool(friend_data.get("response_cache", False)),
+        "memory": bool(friend_data.get("memory", False)),
+    }
+
+
+def chat_events(assistant_info: dict, user_prompt: str, settings: dict, chat_options: dict):
+    """interactive_chat, through the response cache if the friend opted in and memory is off"""
+    events = interactive_chat(assistant_info, user_prompt=user_prompt, memory=settings["memory"], **chat_options)
+    if response_cache is None or settings["memory"] or not settings["response_cache"]:
+        return events
+    persona = ResponseCache.persona(assistant_info.get("description", ""), chat_options.get("min_chunk_size"))
+    return cached_chat(user_prompt, persona, events)
+
+
+async def cached_chat(user_prompt: str, persona: str, events):
+    """
+    Replay an exact (then semantic) cache hit without touching `events`;
+    on a miss stream `events` and store the finished reply in both layers.
+    """
+    key = ResponseCache.key(user_prompt, persona)
+    reply = response_cache.get(key)
+    vector = None
+    if reply is None and semantic_cache is not None and semantic_cache.accepts(user_prompt):
+        with span("embed"):
+            vector = await asyncio.to_thread(semantic_cache.embed, user_prompt)
+        reply = semantic_cache.lookup(persona, vector)
+
+    if reply is not None:
+        source = replay(reply, response_cache.replay_speed)
+    else:
+        def store(recorded):
+            response_cache.put(key, recorded)
+            if vector is not None:
+                semantic_cache.add(persona, vector, recorded)
+        source = record(events, store)
+
+    async for event in source:
+        yield event
+
+
+async def chat_with_speech(assistant_info: dict, user_prompt: str, min_chunk_size: int | None = None, settings: dict | None = None):
+    """
+    Run interactive_chat and synthesize the reply sentence by sentence while
+    the LLM is still streaming. Yields, as soon as they are ready:
+      {"type": "text", "clean_text", "commands", "is_end"}   per chat response
+                                                              (whitespace collapsed, not stripped)
+      {"type": "audio", "index", "text", "audio": bytes}      per sentence, in order
+    The sentence splitter sees every parser update, so each sentence's TTS
+    call starts the moment the sentence is complete and runs concurrently
+    with the others and with the LLM stream. Text events are batched
+    separately, like interactive_chat does: until a command arrives or
+    min_chunk_size characters accumulate (1 = every parser update).
+    settings are the friend's friend_settings().
+    """
+    min_chunk_size = target_chunk_size if min_chunk_size is None else min_chunk_size
+    settings = settings or friend_settings({})
+    events = asyncio.Queue()
+    tts_tasks = asyncio.Queue()
+
+    async def produce_text():
+        splitter = SentenceSplitter()
+        text_buffer = ""
+        try:
+            async for response in chat_events(assistant_info, user_prompt, settings, {"min_chunk_size": 1}):
+                for sentence in splitter.feed(WHITESPACE_RE.sub(" ", response['clean_text'])):
+                    await tts_tasks.put((sentence, asyncio.create_task(generate_speech(sentence))))
+                text_buffer += response['clean_text']
+                if response['commands'] or response['is_end'] or len(text_buffer) >= min_chunk_size:
+                    clean_text = text_buffer.strip() if response['is_end'] else text_buffer
+                    await events.put({"type": "text", **response, "clean_text": WHITESPACE_RE.sub(" ", clean_text)})
+                    text_buffer = ""
+            for sentence in splitter.flush():
+                await tts_tasks.put((sentence, asyncio.create_task(generate_speech(sentence))))
+        except Exception as e:
+            await events.put({"type": "error", "error": e})
+        finally:
+            await tts_tasks.put(None)
+
+    async def produce_audio():
+        index = 0
+        while (item := await tts_tasks.get()) is not None:
+            sentence, task = item
+            audio_bytes = await task
+            if audio_bytes:
+                await events.put({"type": "audio", "index": index, "text": sentence, "audio": audio_bytes})
+                index += 1
+        await events.put(None)
+
+    workers = [asyncio.create_task(produce_text()), asyncio.create_task(produce_audio())]
+    try:
+        while (event := await events.get()) is not None:
+            if event["type"] == "error":
+                raise event["error"]
+            yield event
+    finally:
+        for worker in workers:
+            worker.cancel()
+        while not tts_tasks.empty():
+            item = tts_tasks.get_nowait()
+            if item is not None:
+                item[1].cancel()
+
+
+async def collect_reply(assistant_info: dict, user_prompt: str, settings: dict | None = None) -> tuple:
+    """Drain chat_with_speech into (results, audio_bytes) for the JSON endpoints"""
+    results = []
+    audio_segments = []
+    async for event in chat_with_speech(assistant_info, user_prompt, settings=settings):
+        if event["type"] == "text":
+            event.pop("type")
+            event["clean_text"] = normalize_clean_text(event["clean_text"])
+            logger.debug(f"📊 Response #{len(results) + 1}: {event['clean_text']} {event['commands']}")
+            results.append(event)
+        else:
+            logger.debug(f"🔊 Audio segment #{event['index']} ready: {len(event['audio'])} bytes")
+            audio_segments.append(event["audio"])
+
+    # MP3 frames concatenate cleanly, so the segments play back as one file
+    return results, b"".join(audio_segments) or None
+
+
+async def reply_turn(request: Request, assistant_info: dict, user_prompt: str, settings: dict) -> tuple:
+    """One JSON-endpoint turn: (results, audio_url) for the merged messages"""
+    results, audio_bytes = await collect_reply(assistant_info, user_prompt, settings)
+    # Serve audio as a separate binary resource; the JSON only references it
+    with span("serialize"):
+        return results, store_audio(request, audio_bytes)
+
+
+def store_audio(request: Request, audio_bytes: bytes | None) -> str | None:
+    """Keep reply audio in the audio store and return its absolute /audio URL"""
+    if not audio_bytes:
+        return None
+    audio_id = audio_store.put(audio_bytes)
+    return str(request.url_for("get_audio", audio_id=audio_id))
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 # ==================== Friend Management Endpoints ====================
 
 @app.post("/create-friend")
@@ -141,43 +521,44 @@ async def create_friend(
     image: UploadFile = File(...),
     name: str = Form(...),
     personality: str = Form(default=""),
-    image_id: str = Form(...)
+    image_id: str = Form(...),
+    response_cache: bool = Form(default=False),
+    memory: bool = Form(default=False)
 ):
     """
     Create a new AI friend from an uploaded image file.
-    - Receives image as multipart/form-data
-    - Saves image to disk
+    - Receives image as multipart/form-data, streamed to disk in chunks
+    - Normalizes it once (EXIF rotation, downscale, JPEG) in a worker thread;
+      the same bytes go to Gemini and later to Meshy
     - Creates chatbot assistant with personality
+    - response_cache / memory opt the friend into cached replies or Backboard memory
     - Returns friend data (id, name, model_url, assistant_info)
     """
     global friends_db
     
+    if not IMAGE_ID_RE.fullmatch(image_id):
+        return JSONResponse(content={"success": False, "error": IMAGE_ID_ERROR}, status_code=400)
     friend_id = image_id
-    print(f"👨‍👩‍👧 Creating friend '{name}' (ID: {friend_id})...")
-    print(f"✅ Endpoint received request")
+    logger.info(f"👨‍👩‍👧 Creating friend '{name}' (ID: {friend_id})...")
     
     try:
         # Create models directory if it doesn't exist
-        print(f"📁 Creating models directory...")
         models_dir = os.path.join(os.path.dirname(__file__), "..", "public", "models")
         os.makedirs(models_dir, exist_ok=True)
-        print(f"✅ Models directory ready")
         
         # Save uploaded image file
-        print(f"💾 Saving image file...")
         image_path = os.path.join(models_dir, f"{friend_id}.jpeg")
-        with open(image_path, "wb") as f:
-            contents = await image.read()
-            f.write(contents)
+        with span("upload_read"):
+            uploaded = await save_upload(image, image_path, UPLOAD_MAX_BYTES)
+        with span("image_normalize"):
+            image_data = await asyncio.to_thread(normalize_image, image_path, IMAGE_MAX_SIZE)
         
-        print(f"✅ Image saved to: {image_path}")
-        print(f"📊 File size: {os.path.getsize(image_path)} bytes")
+        logger.debug(f"✅ Image saved to: {image_path} ({uploaded} bytes uploaded, {len(image_data)} normalized)")
         
-        # Create assistant from saved image file
-        print(f"🤖 Starting chatbot assistant creation...")
-        print(f"🎨 Using image: {image_path}, name: {name}, personality: {personality}")
-        assistant_info = await create_chatbot_assistant(image_path, name)
-        print(f"✅ Assistant created: {assistant_info}")
+        # Create assistant from the normalized image
+        logger.debug(f"🎨 Using image: {image_path}, name: {name}, personality: {personality}")
+        assistant_info = await create_chatbot_assistant(image_path, name, image_data)
+        logger.debug(f"✅ Assistant created: {assistant_info.get('assistant_id')}")
         
         
         # Store friend data
@@ -188,10 +569,12 @@ async def create_friend(
             "assistant_info": assistant_info,
             "model_url": "",
             "image_path": image_path,
+            "response_cache": response_cache,
+            "memory": memory,
             "created_at": time.time()
         }
         
-        print(f"✅ Friend '{name}' created successfully!")
+        logger.info(f"✅ Friend '{name}' created successfully!")
         
         return JSONResponse(content={
             "success": True,
@@ -201,14 +584,17 @@ async def create_friend(
                 "personality": personality,
                 "model_url": "",
                 "image_path": image_path,
-                "assistant_id": assistant_info.get("assistant_id")
+                "assistant_id": assistant_info.get("assistant_id"),
+                "settings": friend_settings(friends_db[friend_id])
             }
         })
     
+    except ImageTooLarge as e:
+        logger.warning(f"❌ Rejected upload for '{friend_id}': {e}")
+        return JSONResponse(content={"success": False, "error": str(e)}, status_code=413)
+
     except Exception as e:
-        print(f"❌ Error creating friend: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Error creating friend: {e}")
         return JSONResponse(content={
             "success": False,
             "error": str(e)
@@ -216,15 +602,17 @@ async def create_friend(
 
 
 @app.post("/send-message")
-async def send_message(req: SendMessageRequest):
+async def send_message(req: SendMessageRequest, request: Request):
     """
     Send a message to a friend's assistant and get response.
-    Returns streamed response with text and commands.
+    Returns streamed response with text and commands; the reply audio is
+    fetched separately from `audio_url`.
     """
     global friends_db
     
     friend_id = req.friend_id
-    print(f"💬 Sending message to friend '{friend_id}': {req.message}")
+    logger.info(f"💬 Sending message to friend '{friend_id}'")
+    logger.debug(f"💬 Message: {req.message}")
     
     # Check if friend exists
     if friend_id not in friends_db:
@@ -236,63 +624,77 @@ async def send_message(req: SendMessageRequest):
     try:
         friend_data = friends_db[friend_id]
         assistant_info = friend_data["assistant_info"]
-        results = []
-        response_count = 0
         
-        # Send message to assistant and stream response
-        print(f"🎯 Sending message to assistant...")
-        async for response in interactive_chat(assistant_info, user_prompt=req.message):
-            response_count += 1
-            print(f"📊 Response #{response_count} received")
-            
-            clean_text = response['clean_text']
-            lines = clean_text.split('\n')
-            cleaned_lines = []
-            for line in lines:
-                stripped = line.strip()
-                if stripped:
-                    cleaned_lines.append(stripped)
-            clean_text = ' '.join(cleaned_lines)
-            response['clean_text'] = clean_text
-            
-            print(f"\n[RESPONSE] Clean text: {response['clean_text']}")
-            print(f"[RESPONSE] Commands: {response['commands']}")
-            
-            results.append(response)
-        
-        print(f"📤 Returning {len(results)} results to frontend")
-        
-        # Generate speech for all responses
-        print(f"🔊 Generating speech for responses...")
-        combined_text = " ".join([r['clean_text'] for r in results])
-        audio_bytes = generate_speech(combined_text)
-        
-        # Encode audio to base64 for JSON response
-        audio_data = None
-        if audio_bytes:
-            import base64
-            audio_data = base64.b64encode(audio_bytes).decode('utf-8')
-            print(f"✅ Audio encoded: {len(audio_data)} chars")
+        # Stream the reply and synthesize speech sentence by sentence
+        # (messages that arrive together share one turn; the last sender gets the reply)
+        reply, merged = await friend_turns.submit(
+            friend_id, req.message, lambda text: reply_turn(request, assistant_info, text, friend_settings(friend_data))
+        )
+        results, audio_url = reply or ([], None)
+        logger.debug(f"📤 Returning {len(results)} results to frontend")
         
         return JSONResponse(content={
             "success": True,
             "friend_id": friend_id,
             "results": results,
-            "audio": audio_data
+            "audio_url": audio_url,
+            "merged_messages": merged
         })
     
     except Exception as e:
-        print(f"❌ Error sending message: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Error sending message: {e}")
         return JSONResponse(content={
             "success": False,
             "error": str(e)
         }, status_code=400)
 
 
+@app.post("/send-message/stream")
+async def send_message_stream(req: SendMessageRequest, request: Request):
+    """
+    Send a message to a friend's assistant and stream the reply as Server-Sent Events:
+      event: text   {clean_text, commands, is_end}  as soon as the parser produces it
+      event: audio  {index, text, audio_url}        per sentence, in order
+      event: done   {}                              (or event: error {error})
+    """
+    global friends_db
+    
+    friend_id = req.friend_id
+    logger.info(f"💬 Streaming message to friend '{friend_id}'")
+    logger.debug(f"💬 Message: {req.message}")
+    
+    if friend_id not in friends_db:
+        return JSONResponse(content={
+            "success": False,
+            "error": f"Friend '{friend_id}' not found"
+        }, status_code=404)
+    
+    assistant_info = friends_db[friend_id]["assistant_info"]
+    settings = friend_settings(friends_db[friend_id])
+    
+    async def event_stream():
+        try:
+            async with friend_turns.turn(friend_id):
+                async for event in chat_with_speech(assistant_info, req.message, min_chunk_size=1, settings=settings):
+                    event_type = event.pop("type")
+                    if event_type == "audio":
+                        event["audio_url"] = store_audio(request, event.pop("audio"))
+                    yield sse_event(event_type, event)
+            yield sse_event("done", {})
+        except Exception as e:
+            logger.exception(f"❌ Error streaming message: {e}")
+            yield sse_event("error", {"error": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/send-voice-message")
 async def send_voice_message(
+    request: Request,
     audio: UploadFile = File(...),
     friend_id: str = Form(...)
 ):
@@ -300,9 +702,9 @@ async def send_voice_message(
     Receive audio file, convert to text using Whisper, 
     then process as text message through the assistant.
     """
-    global friends_db
+    global friends_db, stt_audio_worker
     
-    print(f"🎤 Received voice message for friend '{friend_id}'")
+    logger.info(f"🎤 Received voice message for friend '{friend_id}'")
     
     # Check if friend exists
     if friend_id not in friends_db:
@@ -312,97 +714,144 @@ async def send_voice_message(
         }, status_code=404)
     
     try:
-        # Save audio file temporarily
-        audio_content = await audio.read()
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
-            tmp.write(audio_content)
-            audio_path = tmp.name
-        
-        print(f"💾 Audio saved temporarily to: {audio_path}")
-        
-        # Convert speech to text using Whisper
-        print(f"🎙️ Converting speech to text...")
-        stt = audio_stt(model_name="base", device="cpu", language="en")
-        stt.audio_queue.put(audio_path)
+        # Keep the upload in memory; the STT worker decodes it directly
+        with span("upload_read"):
+            audio_content = await audio.read()
+        logger.debug(f"📥 Audio received: {len(audio_content)} bytes")
         
-        # Wait for transcription
-        import time
-        timeout = 60
-        start_time = time.time()
-        transcribed_text = None
-        
-        while time.time() - start_time < timeout:
-            try:
-                transcribed_text = stt.text_queue.get(timeout=1)
-                break
-            except:
-                continue
-        
-        if not transcribed_text:
+        # Convert speech to text using Whisper (awaits only this request's result)
+        try:
+            with span("stt"):
+                transcribed_text = await stt_audio_worker.transcribe(audio_content, timeout=STT_TIMEOUT)
+        except asyncio.TimeoutError:
             raise Exception("Failed to transcribe audio - timeout")
         
-        # Clean up temp file
-        os.unlink(audio_path)
+        if not transcribed_text:
+            raise Exception("Failed to transcribe audio - no speech detected")
         
-        print(f"✅ Transcribed text: '{transcribed_text}'")
+        logger.debug(f"✅ Transcribed text: '{transcribed_text}'")
         
         # Now process the transcribed text as a normal message
-        print(f"💬 Processing transcribed message...")
         friend_data = friends_db[friend_id]
         assistant_info = friend_data["assistant_info"]
-        results = []
-        response_count = 0
-        
-        # Send message to assistant and stream response
-        async for response in interactive_chat(assistant_info, user_prompt=transcribed_text):
-            response_count += 1
-            print(f"📊 Response #{response_count} received")
-            
-            clean_text = response['clean_text']
-            lines = clean_text.split('\n')
-            cleaned_lines = []
-            for line in lines:
-                stripped = line.strip()
-                if stripped:
-                    cleaned_lines.append(stripped)
-            clean_text = ' '.join(cleaned_lines)
-            response['clean_text'] = clean_text
-            
-            print(f"\n[RESPONSE] Clean text: {response['clean_text']}")
-            print(f"[RESPONSE] Commands: {response['commands']}")
-            
-            results.append(response)
         
-        print(f"📤 Returning {len(results)} results to frontend")
-        
-        # Generate speech for all responses
-        print(f"🔊 Generating speech for responses...")
-        combined_text = " ".join([r['clean_text'] for r in results])
-        audio_bytes = generate_speech(combined_text)
-        
-        # Encode audio to base64 for JSON response
-        audio_data = None
-        if audio_bytes:
-            import base64
-            audio_data = base64.b64encode(audio_bytes).decode('utf-8')
-            print(f"✅ Audio encoded: {len(audio_data)} chars")
+        # Stream the reply and synthesize speech sentence by sentence
+        reply, merged = await friend_turns.submit(
+            friend_id, transcribed_text, lambda text: reply_turn(request, assistant_info, text, friend_settings(friend_data))
+        )
+        results, audio_url = reply or ([], None)
+        logger.debug(f"📤 Returning {len(results)} results to frontend")
         
         return JSONResponse(content={
             "success": True,
             "friend_id": friend_id,
             "transcribed_text": transcribed_text,
             "results": results,
-            "audio": audio_data
+            "audio_url": audio_url,
+            "merged_messages": merged
         })
         
     except Exception as e:
-        print(f"❌ Error processing voice message: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Error processing voice message: {e}")
         return JSONResponse(content={
             "success": False,
             "error": str(e)
         }, status_code=400)
+
+
+@app.websocket("/ws/stt")
+async def stt_websocket(websocket: WebSocket, sample_rate: int = 16000):
+    """
+    Streaming speech-to-text.
+    - Client sends binary frames of PCM16 mono audio (?sample_rate=, default 16000)
+    - Server replies with {"type": "partial"|"final", "text", "segment"} as VAD
+      splits the stream into utterances
+    - Client sends the text message "end" (or {"type": "end"}) to flush the last
+      segment; the server answers {"type": "end"}
+    """
+    global stt_audio_worker
+
+    await websocket.accept()
+    if sample_rate <= 0:
+        await websocket.send_json({"type": "error", "error": f"sample_rate must be positive, got {sample_rate}"})
+        await websocket.close(code=1008)
+        return
+    stream = stt_stream(stt_audio_worker, sampling_rate=sample_rate, timeout=STT_TIMEOUT)
+    logger.info(f"🎙️ STT stream opened ({sample_rate} Hz)")
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                events = await stream.feed(message["bytes"])
+                for event in events:
+                    await websocket.send_json(event)
+                continue
+
+            text = (message.get("text") or "").strip()
+            try:
+                is_end = text == "end" or json.loads(text).get("type") == "end"
+            except (ValueError, AttributeError):
+                is_end = False
+
+            if is_end:
+                for event in await stream.flush():
+                    await websocket.send_json(event)
+                await websocket.send_json({"type": "end"})
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.exception(f"❌ Error in STT stream: {e}")
+        await websocket.close(code=1011)
+    finally:
+        logger.info(f"🛑 STT stream closed ({stream.segments} segments)")
+
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Streaming chat with sentence-level audio.
+    - Client sends {"friend_id", "message"} as JSON
+    - Server sends {"type": "text", "clean_text", "commands", "is_end"} as the reply
+      streams, and for each sentence {"type": "audio", "index", "text"} followed by
+      the MP3 segment as a binary frame (in order), then {"type": "done"}
+    """
+    global friends_db
+
+    await websocket.accept()
+    try:
+        while True:
+            req = SendMessageRequest(**await websocket.receive_json())
+            if req.friend_id not in friends_db:
+                await websocket.send_json({"type": "error", "error": f"Friend '{req.friend_id}' not found"})
+                continue
+
+            logger.info(f"💬 [ws] Sending message to friend '{req.friend_id}'")
+            assistant_info = friends_db[req.friend_id]["assistant_info"]
+            settings = friend_settings(friends_db[req.friend_id])
+            try:
+                async with friend_turns.turn(req.friend_id):
+                    async for event in chat_with_speech(assistant_info, req.message, settings=settings):
+                        if event["type"] == "audio":
+                            audio_bytes = event.pop("audio")
+                            await websocket.send_json(event)
+                            await websocket.send_bytes(audio_bytes)
+                        else:
+                            await websocket.send_json(event)
+            except Exception as e:
+                logger.exception(f"❌ Error in chat stream: {e}")
+                await websocket.send_json({"type": "error", "error": str(e)})
+                continue
+            await websocket.send_json({"type": "done"})
+
+    except WebSocketDisconnect:
+        pass
+
+
 async def get_friends():
     """
     Get all created friends with their metadata.
@@ -443,11 +892,227 @@ async def get_friend(friend_id: str):
             "name": friend_data.get("name"),
             "personality": friend_data.get("personality"),
             "model_url": friend_data.get("model_url"),
-            "created_at": friend_data.get("created_at")
+            "created_at": friend_data.get("created_at"),
+            "settings": friend_settings(friend_data)
         }
     })
 
 
+@app.patch("/friends/{friend_id}/settings")
+async def update_friend_settings(friend_id: str, req: FriendSettingsRequest):
+    """
+    Turn a friend's response cache or conversation memory on or off.
+    Replies are never served from the cache while memory is on.
+    """
+    global friends_db
+    
+    friend_data = friends_db.get(friend_id)
+    if friend_data is None:
+        return JSONResponse(content={
+            "success": False,
+            "error": f"Friend '{friend_id}' not found"
+        }, status_code=404)
+    
+    for name, value in req.model_dump(exclude_none=True).items():
+        friend_data[name] = value
+    friends_db[friend_id] = friend_data
+    
+    return JSONResponse(content={"success": True, "settings": friend_settings(friend_data)})
+
+
+# ==================== 3D Models ====================
+
+@app.post("/generate-3d", status_code=202)
+async def generate_3d(req: ImageRequest, request: Request):
+    """
+    Start generating a 3D model from an image with Meshy.
+    Returns a job at once; follow it with GET /generate-3d/{job_id}
+    (polling) or GET /generate-3d/{job_id}/events (Server-Sent Events).
+    Images already generated come back as a finished job, and images
+    currently generating join the running job. New images get a 429 with
+    Retry-After once MESHY_MAX_PENDING generations are running or queued.
+    """
+    global meshy_jobs
+
+    if meshy_jobs is None:
+        return JSONResponse(content={"success": False, "error": "MESHY_API_KEY not configured"}, status_code=503)
+    if not IMAGE_ID_RE.fullmatch(req.image_id):
+        return JSONResponse(content={"success": False, "error": IMAGE_ID_ERROR}, status_code=400)
+
+    image_url = req.image_url
+    if not image_url:
+        image_path = (friends_db.get(req.image_id) or {}).get("image_path")
+        if not image_path or not os.path.isfile(image_path):
+            return JSONResponse(content={
+                "success": False,
+                "error": f"No image_url given and no uploaded image for '{req.image_id}'"
+            }, status_code=400)
+        # Reuse the normalized upload from /create-friend
+        with open(image_path, "rb") as f:
+            image_url = data_url(await asyncio.to_thread(f.read))
+
+    try:
+        job = await meshy_jobs.submit(image_url, req.image_id)
+    except Overloaded as e:
+        logger.warning(f"🚦 {e}, rejecting (retry after {e.retry_after}s)")
+        REJECTED_TOTAL.inc(endpoint=request.url.path)
+        return JSONResponse(
+            content={"success": False, "error": "Too many 3D models are generating, please retry shortly"},
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    logger.info(f"🧊 3D generation for '{req.image_id}': job {job.job_id} ({job.status})")
+
+    return JSONResponse(content={
+        "success": True,
+        "job": job_payload(request, job.to_dict()),
+        "status_url": str(request.url_for("get_3d_job", job_id=job.job_id)),
+        "events_url": str(request.url_for("get_3d_job_events", job_id=job.job_id)),
+    }, status_code=202)
+
+
+def job_payload(request: Request, state: dict) -> dict:
+    """Add the model URL to a finished job's state"""
+    if state["status"] == "succeeded":
+        state["model_url"] = str(request.url_for("get_model", image_id=state["model_id"]))
+    return state
+
+
+@app.get("/generate-3d/{job_id}")
+async def get_3d_job(job_id: str, request: Request):
+    """
+    Current status and progress of a 3D generation job.
+    """
+    job = meshy_jobs.get(job_id) if meshy_jobs else None
+    if job is None:
+        return JSONResponse(content={"success": False, "error": f"Job '{job_id}' not found"}, status_code=404)
+
+    return JSONResponse(content={"success": True, "job": job_payload(request, job.to_dict())})
+
+
+@app.get("/generate-3d/{job_id}/events")
+async def get_3d_job_events(job_id: str, request: Request):
+    """
+    Stream a 3D generation job as Server-Sent Events:
+      event: progress  {job}  on every status/progress change
+      event: done      {job}  once the model is ready (or event: error {job})
+    """
+    job = meshy_jobs.get(job_id) if meshy_jobs else None
+    if job is None:
+        return JSONResponse(content={"success": False, "error": f"Job '{job_id}' not found"}, status_code=404)
+
+    async def event_stream():
+        async for state in meshy_jobs.events(job):
+            state = job_payload(request, state)
+            if state["status"] == "succeeded":
+                yield sse_event("done", state)
+            elif state["status"] == "failed":
+                yield sse_event("error", state)
+            else:
+                yield sse_event("progress", state)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.api_route("/models/{image_id}", methods=["GET", "HEAD"])
+async def get_model(image_id: str, request: Request, lod: str | None = None):
+    """
+    Serve a generated GLB model, by model_id or by the image_id it was requested for.
+    - ?lod=low|high serves a simplified, smaller variant; until it has been built
+      the original is served (and not cached as immutable)
+    - Strong ETag (content hash); If-None-Match answers 304
+    - model_ids are content-addressed and cached as immutable; image_id aliases revalidate
+    - Range requests (uncompressed bytes)
+    - Precompressed br/gzip variants chosen from Accept-Encoding; they are built
+      in the background the first time a model is requested
+    """
+    global model_cache, model_optimizer
+
+    if lod is not None and lod not in LODS:
+        return JSONResponse(content={
+            "success": False,
+            "error": f"Unknown lod '{lod}', expected one of {sorted(LODS)}"
+        }, status_code=400)
+
+    file_path = model_cache.resolve(image_id) if model_cache else None
+    if file_path is None:
+        return JSONResponse(content={
+            "success": False,
+            "error": f"Model '{image_id}' not found. Has it been generated yet?"
+        }, status_code=404)
+
+    immutable = model_cache.is_immutable(image_id)
+    if lod is not None and model_optimizer is not None:
+        lod_path = model_optimizer.get(file_path, lod)
+        if lod_path is None:
+            model_optimizer.schedule(file_path)
+            immutable = False
+        else:
+            file_path = lod_path
+
+    etag = await asyncio.to_thread(model_cache.etag, file_path)
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable" if immutable else "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    # Pick the representation: a compressed variant unless this is a Range request
+    serve_path = file_path
+    if "range" not in request.headers:
+        accepted = accepted_encodings(request.headers.get("accept-encoding"))
+        for encoding in ENCODINGS:
+            variant_path = model_cache.variant(file_path, encoding) if encoding in accepted else None
+            if variant_path:
+                serve_path = variant_path
+                etag = f'{etag[:-1]}-{encoding}"'
+                headers["Content-Encoding"] = encoding
+                break
+    if model_cache.needs_variants(file_path):
+        asyncio.get_running_loop().run_in_executor(None, model_cache.compress, file_path)
+    headers["ETag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+    return FileResponse(serve_path, media_type="model/gltf-binary", filename=f"{image_id}.glb", headers=headers)
+
+
+# ==================== Audio ====================
+
+@app.get("/audio/{audio_id}")
+async def get_audio(audio_id: str, request: Request):
+    """
+    Serve reply audio as raw MP3 (supports Range requests for seeking/streaming players).
+    """
+    entry = audio_store.get(audio_id)
+    if entry is None:
+        return JSONResponse(content={
+            "success": False,
+            "error": f"Audio '{audio_id}' not found or expired"
+        }, status_code=404)
+    
+    data, media_type = entry
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, max-age=300"}
+    try:
+        byte_range = parse_range(request.headers.get("range"), len(data))
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{len(data)}"})
+    
+    if byte_range is None:
+        return Response(content=data, media_type=media_type, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
 # ==================== Health Check ====================
 
 @app.get("/health")
@@ -456,3 +1121,91 @@ async def health_check():
     Health check endpoint.
     """
     return JSONResponse(content={"status": "ok", "version": "vic_edition"})
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Per-stage and per-route latency histograms in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/model-cache/stats")
+async def model_cache_stats():
+    """
+    Size and exact/perceptual hit counters of the generated model cache.
+    """
+    global model_cache
+
+    if model_cache is None:
+        return JSONResponse(content={"success": False, "error": "Model cache not started"}, status_code=503)
+
+    return JSONResponse(content={"success": True, "cache": model_cache.stats()})
+
+
+@app.get("/response-cache/stats")
+async def response_cache_stats():
+    """
+    Hit/miss counters of the opt-in chat response cache (exact and semantic layers).
+    """
+    global response_cache, semantic_cache
+
+    if response_cache is None:
+        return JSONResponse(content={"success": False, "error": "Response cache not started"}, status_code=503)
+
+    return JSONResponse(content={
+        "success": True,
+        "cache": response_cache.stats(),
+        "semantic": semantic_cache.stats() if semantic_cache else None
+    })
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """
+    In-flight, queued, admitted and rejected counts of each limited endpoint.
+    """
+    return JSONResponse(content={"success": True, "endpoints": {path: limiter.stats() for path, limiter in limiters.items()}})
+
+
+@app.get("/turns/stats")
+async def turns_stats():
+    """
+    Conversation turns run vs. messages received (the difference was coalesced).
+    """
+    return JSONResponse(content={"success": True, "turns": friend_turns.stats()})
+
+
+@app.get("/stt/stats")
+async def stt_stats():
+    """
+    Queue depth and per-worker utilization of the shared STT pool.
+    """
+    global stt_audio_worker
+
+    if stt_audio_worker is None:
+        return JSONResponse(content={"success": False, "error": "STT pool not started"}, status_code=503)
+
+    return JSONResponse(content={"success": True, "stt": stt_audio_worker.stats()})
+
+
+@app.get("/backboard/stats")
+async def backboard_client_stats():
+    """
+    Connection reuse of the shared Backboard client (sockets opened vs requests served).
+    """
+    return JSONResponse(content={"success": True, "backboard": backboard_stats()})
+
+
+@app.get("/tts/stats")
+async def tts_stats():
+    """
+    Hit/miss and byte counters of the TTS audio cache.
+    """
+    global tts_client
+
+    if tts_client is None or tts_client.cache is None:
+        return JSONResponse(content={"success": False, "error": "TTS cache not enabled"}, status_code=503)
+
+    return JSONResponse(content={"success": True, "cache": tts_client.cache.stats()})